@@ -4,20 +4,17 @@ import json
 import os
 import sys
 from collections import deque
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, sleep
+
+# reference of the startup timing report
+STARTED = perf_counter()
 
-import holidays
 import pytz
-import requests
-from bs4 import BeautifulSoup
 from colorama import init
-from OpenSSL.SSL import SysCallError
-
-from library import Notify, get_live_price, master_logger
-from master import Master
 
-# setup for coloured output
-init()
+from library import (Notify, configure_session, get_session, get_source, json_sink, make_source, master_logger,
+                     session_stats, set_source)
 
 ##############################################################
 
@@ -30,15 +27,12 @@ HEADING = '''
                                            /____/
 
 '''
-Notify.heading(HEADING)
 
 ##############################################################
 
 # set time zone
 global TZ
 TZ = pytz.timezone('Europe/London')
-# set holidays
-HOLIDAYS = holidays.UnitedStates()
 # set market open time
 OPEN_TIME = datetime.time(hour=9, minute=15, second=0)
 # set market close time
@@ -53,6 +47,8 @@ PENNY_STOCK_THRESHOLD = 50
 NUM_OF_STOCKS_TO_SEARCH = 100
 # number of stocks to focus trading on
 NUM_OF_STOCKS_TO_FOCUS = 5
+# number of stocks priced by a single request while searching
+SEARCH_BATCH_SIZE = 10
 # percentage buffer to be set for stop loss/trade exit
 global BUFFER_PERCENT
 BUFFER_PERCENT = 0.06
@@ -73,81 +69,216 @@ IDLE_DELAY = 0#1800
 PACK_UP = datetime.time(hour=15, minute=15, second=0)
 
 ##############################################################
-TODAY = datetime.date.today().strftime("%d-%m-%Y")
-if not os.path.exists(f"database/{TODAY}"):
-    os.mkdir(f"database/{TODAY}")
-master_logger = master_logger(f'database/{TODAY}/master.log')
-master_logger.info("-"*76)
-master_logger.info("-"*27 + " NEW SESSION DETECTED " + "-"*27)
-sys.stderr = open(f"database/{TODAY}/errorStream.txt", "a")
+
+HEADERS = {
+    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/80.0.3987.163 Safari/537.36"
+}
 
 ##############################################################
 
-try:
-    ACCOUNT = json.loads(open("database/user_info.json").read())["account_balance"] * FEASIBLE_PERCENT
-except FileNotFoundError:
-    Notify.fatal('User info not found, Aborting.')
-    master_logger.critical("User info not found")
-    quit(0)
-master_logger.info("Successfully loaded user_info.json")
-master_logger.info("-"*76)
+# (phase, seconds since start) of every step of the startup, reported with --startup-report
+TIMINGS = list()
 
 ##############################################################
 
-HEADERS = {
-    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/80.0.3987.163 Safari/537.36"
-}
 
-##############################################################
+def mark(phase):
+    TIMINGS.append((phase, perf_counter() - STARTED))
+
+
+def report_startup():
+    """
+        Log the time taken by every step of the startup, and show it with --startup-report
+    """
+    previous = 0
+    for phase, elapsed in TIMINGS:
+        master_logger.info("Startup : %s took %.1f ms", phase, (elapsed - previous) * 1000)
+        if args.startup_report:
+            Notify.info(f"Startup : {phase:<16}{(elapsed - previous) * 1000:>8.1f} ms")
+        previous = elapsed
+    master_logger.info("Startup : ready after %.1f ms", previous * 1000)
+    if args.startup_report:
+        Notify.info(f"Startup : {'ready after':<16}{previous * 1000:>8.1f} ms")
+        Notify.write()
+
 
-parser = argparse.ArgumentParser(prog="application.py",
-                                 description="A fully automated Pythonic trading bot\n\nAuthor : Ashwin A Nayar",
-                                 epilog="Time for some real money !",
-                                 formatter_class=argparse.RawTextHelpFormatter
-                                 )
+def build_parser():
+    parser = argparse.ArgumentParser(prog="application.py",
+                                     description="A fully automated Pythonic trading bot\n\nAuthor : Ashwin A Nayar",
+                                     epilog="Time for some real money !",
+                                     formatter_class=argparse.RawTextHelpFormatter
+                                     )
 
-parser.add_argument("--delay", type=int, default=IDLE_DELAY,
-                    help="Duration of Idle Phase, in seconds")
+    parser.add_argument("--delay", type=int, default=IDLE_DELAY,
+                        help="Duration of Idle Phase, in seconds")
 
-parser.add_argument("-nd", action="store_true",
-                    help="Skip Idle Phase, not recommended")
+    parser.add_argument("-nd", action="store_true",
+                        help="Skip Idle Phase, not recommended")
 
-parser.add_argument("-np", action="store_true",
-                    help="Set period interval to zero, not recommended")
+    parser.add_argument("-np", action="store_true",
+                        help="Set period interval to zero, not recommended")
 
-parser.add_argument("-t", action="store_true",
-                    help='Run script in trial mode, for debugging purposes')
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of concurrent price requests per round")
 
-args = parser.parse_args()
+    parser.add_argument("--source", default="live",
+                        help="Source of prices : live, synthetic[:seed] or replay:path[,path...]")
+
+    parser.add_argument("--stagger", type=float, default=0.0,
+                        help="Fraction of each period the price requests of a round are spread over")
+
+    parser.add_argument("--overrun", choices=("skip", "compress"), default="skip",
+                        help="Skip rounds missed by an overrunning round, or run them back to back")
+
+    parser.add_argument("--warm-start", action="store_true",
+                        help="Fill the observation phase from the latest intraday bars instead of observing live")
+
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve runtime metrics in the Prometheus text format on this local port")
+
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile CPU time and allocations of the session, reports are saved with its databases")
+
+    parser.add_argument("--profile-every", type=int, default=1,
+                        help="Profile one trading round out of every this many")
+
+    parser.add_argument("--book", action="store_true",
+                        help="Decide for all traders at once on a columnar book")
+
+    parser.add_argument("--instant", action="store_true",
+                        help="Render console messages at once, recommended for production")
+
+    parser.add_argument("--json-log", action="store_true",
+                        help="Additionally write all logs to a compact JSON lines file")
+
+    parser.add_argument("--startup-report", action="store_true",
+                        help="Show the time taken by every step of the startup")
+
+    parser.add_argument("-t", action="store_true",
+                        help='Run script in trial mode, for debugging purposes')
+
+    return parser
+
+
+def setup(argv=None):
+    """
+        Parse arguments and prepare the session : console, logs, account, HTTP session and price source. Importing
+        the module has no side effects, nothing is read or written before the arguments are known
+    """
+    global args, master_logger, ACCOUNT, IDLE_DELAY, PERIOD_INTERVAL, DEV_MODE, PENNY_STOCK_THRESHOLD, TODAY
+
+    mark("imports")
+    args = build_parser().parse_args(argv)
+    mark("arguments")
+
+    # setup for coloured output
+    init()
+    if args.instant:
+        Notify.configure(instant=True)
+    Notify.heading(HEADING)
+
+    TODAY = datetime.date.today().strftime("%d-%m-%Y")
+    if not os.path.exists(f"database/{TODAY}"):
+        os.mkdir(f"database/{TODAY}")
+    master_logger = master_logger(f'database/{TODAY}/master.log')
+    master_logger.info("-"*76)
+    master_logger.info("-"*27 + " NEW SESSION DETECTED " + "-"*27)
+    sys.stderr = open(f"database/{TODAY}/errorStream.txt", "a")
+    mark("logging")
 
-if args.nd:
-    if args.delay != IDLE_DELAY:
-        Notify.fatal("Invalid set of arguments given. Aborting")
-        master_logger.critical("Received no delay and custom delay")
+    try:
+        ACCOUNT = json.loads(open("database/user_info.json").read())["account_balance"] * FEASIBLE_PERCENT
+    except FileNotFoundError:
+        Notify.fatal('User info not found, Aborting.')
+        master_logger.critical("User info not found")
         quit(0)
+    master_logger.info("Successfully loaded user_info.json")
+    master_logger.info("-"*76)
+    mark("user info")
+
+    if args.json_log:
+        json_sink(f"database/{TODAY}/activity.jsonl")
+        master_logger.info("Writing JSON lines log")
+
+    if args.nd:
+        if args.delay != IDLE_DELAY:
+            Notify.fatal("Invalid set of arguments given. Aborting")
+            master_logger.critical("Received no delay and custom delay")
+            quit(0)
+        else:
+            IDLE_DELAY = 0
+            master_logger.warning("[  MODE  ]  Zero delay")
     else:
-        IDLE_DELAY = 0
-        master_logger.warning("[  MODE  ]  Zero delay")
-else:
-    IDLE_DELAY = args.delay
-    master_logger.info(f"Idle delay set to {IDLE_DELAY}")
-
-if args.np:
-    PERIOD_INTERVAL = 0
-    master_logger.warning("[  MODE  ]  Zero period interval")
-
-if args.t:
-    IDLE_DELAY = 1
-    PERIOD_INTERVAL = 0
-    Notify.warn("Running in Test Mode, meant for debugging and demonstration purposes only.")
-    master_logger.warning("[  MODE  ]  TEST")
-    print("")
-
-# developer mode
-DEV_MODE = args.nd and args.np
-if DEV_MODE:
-    PENNY_STOCK_THRESHOLD = 0
-    master_logger.warning("[  MODE  ]  DEVELOPER")
+        IDLE_DELAY = args.delay
+        master_logger.info(f"Idle delay set to {IDLE_DELAY}")
+
+    if args.np:
+        PERIOD_INTERVAL = 0
+        master_logger.warning("[  MODE  ]  Zero period interval")
+
+    if args.t:
+        IDLE_DELAY = 1
+        PERIOD_INTERVAL = 0
+        Notify.warn("Running in Test Mode, meant for debugging and demonstration purposes only.")
+        master_logger.warning("[  MODE  ]  TEST")
+        Notify.write()
+
+    # the trading engine loads NumPy and requests, so it is only imported once the arguments are known
+    from library.session import POOL_MAXSIZE
+    from master import WORKERS
+    mark("trading engine")
+
+    if args.workers is None:
+        args.workers = WORKERS
+    if args.workers < 1:
+        Notify.fatal("Number of workers must be positive. Aborting")
+        master_logger.critical(f"Received invalid number of workers : {args.workers}")
+        quit(0)
+    if not 0 <= args.stagger < 1:
+        Notify.fatal("Stagger must be a fraction of the period. Aborting")
+        master_logger.critical(f"Received invalid stagger : {args.stagger}")
+        quit(0)
+    # keep a connection alive for every worker
+    configure_session(pool_maxsize=max(args.workers, POOL_MAXSIZE))
+    master_logger.info(f"Workers set to {args.workers}")
+
+    try:
+        set_source(make_source(args.source))
+    except ValueError as e:
+        Notify.fatal(f"{e}. Aborting")
+        master_logger.critical(f"Received invalid price source : {args.source}")
+        quit(0)
+    if args.source != "live":
+        master_logger.warning(f"[  MODE  ]  Price source {args.source}")
+    mark("price source")
+
+    if args.metrics_port is not None:
+        from library.metrics import get_metrics
+        try:
+            port = get_metrics().serve(args.metrics_port)
+        except OSError as e:
+            Notify.fatal(f"Could not serve metrics on port {args.metrics_port}. Aborting")
+            master_logger.critical(f"Could not serve metrics : {e}")
+            quit(0)
+        master_logger.info(f"Serving metrics on port {port}")
+        mark("metrics")
+
+    if args.profile:
+        from library.profiling import configure_profiler
+        if args.profile_every < 1:
+            Notify.fatal("Rounds must be profiled one out of a positive number. Aborting")
+            master_logger.critical(f"Received invalid profiling interval : {args.profile_every}")
+            quit(0)
+        configure_profiler(every=args.profile_every)
+        master_logger.warning(f"[  MODE  ]  Profiling one round out of every {args.profile_every}")
+
+    # developer mode
+    DEV_MODE = args.nd and args.np
+    if DEV_MODE:
+        PENNY_STOCK_THRESHOLD = 0
+        master_logger.warning("[  MODE  ]  DEVELOPER")
+
+    report_startup()
 
 ##############################################################
 
@@ -160,10 +291,12 @@ def is_open():
 
     """
     global ml
+    # set holidays, the calendars are only loaded when the market is checked
+    import holidays
 
     now = datetime.datetime.now(TZ)
     # if a holiday
-    if now.strftime('%Y-%m-%d') in HOLIDAYS:
+    if now.strftime('%Y-%m-%d') in holidays.UnitedStates():
         master_logger.error("Holiday ! ")
         return False
     # if before opening or after closing
@@ -177,15 +310,15 @@ def is_open():
     return True
 
 
-def fetch_stocks():
+def fetch_gainers():
     """
-        Find relevant stocks to focus on for trading
+        Scrape the tickers of the top gainers from Yahoo Finance
     Returns:
-        Deque of tickers of relevant stocks
+        List of tickers, in order of the gainers table
 
     """
-
-    global ml
+    # the HTML parser is only needed to scrape live gainers
+    from bs4 import BeautifulSoup
 
     # url to grab data from
     url = f'https://finance.yahoo.com/gainers?count={NUM_OF_STOCKS_TO_SEARCH}'
@@ -193,15 +326,32 @@ def fetch_stocks():
     headers = {
         'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/79.0.3945.130 Safari/537.36'}
     try:
-        src = requests.get(url=url, headers=headers).content
+        src = get_session().get(url=url, headers=headers).content
     except Exception as e:
         src = None
         Notify.fatal("Trade abort due to unexpected error. Check activity log for details")
-        master_logger.critical("Encountered error : ", e)
+        master_logger.critical("Encountered error : %s", e)
         quit(0)
     # soup object of source code
     soup = BeautifulSoup(src, "html.parser")
     rows = soup.find('table').tbody.find_all('tr')
+    return [tr.find_all('td')[0].text.strip() for tr in rows]
+
+
+def fetch_stocks():
+    """
+        Find relevant stocks to focus on for trading
+    Returns:
+        Deque of tickers of relevant stocks
+
+    """
+
+    global ml
+
+    # search the tickers offered by the price source, the top gainers for live prices
+    tickers = get_source().candidates()
+    if tickers is None:
+        tickers = fetch_gainers()
     # initialisations
     stocks_temp = dict()
     # check previous day's closing status
@@ -212,24 +362,36 @@ def fetch_stocks():
     # set counter
     count = len(stocks_temp)
     stocks = deque()
-    # iterate over rows in web page
-    for tr in rows:
-        # exit if
-        if count == NUM_OF_STOCKS_TO_FOCUS:
-            break
-        else:
-            row_data = tr.find_all('td')
-            ticker = row_data[0].text.strip()
-            price = get_live_price(ticker)
-            
-            
-            # split ticker for checking if same stock of different stock exchange is selected or not
-            stock_name = ""
-            stock_ex= "US"
-            stock_name = ticker #ticker.split(".")
-            if price >= PENNY_STOCK_THRESHOLD and stock_name not in stocks_temp:
-                stocks_temp[stock_name] = stock_ex
-                count += 1
+    # price the listed tickers in batches, concurrently, while keeping the order of the gainers table
+    batches = [tickers[i:i + SEARCH_BATCH_SIZE] for i in range(0, len(tickers), SEARCH_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(get_source().get_prices, batch) for batch in batches]
+        for batch, future in zip(batches, futures):
+            # exit if
+            if count == NUM_OF_STOCKS_TO_FOCUS:
+                break
+            try:
+                prices = future.result()
+            except Exception as e:
+                master_logger.error("Could not price %s : %s", ", ".join(batch), e)
+                continue
+            # iterate over rows in web page
+            for ticker in batch:
+                # exit if
+                if count == NUM_OF_STOCKS_TO_FOCUS:
+                    break
+                price = prices.get(ticker)
+
+                # split ticker for checking if same stock of different stock exchange is selected or not
+                stock_name = ""
+                stock_ex= "US"
+                stock_name = ticker #ticker.split(".")
+                if price is not None and price >= PENNY_STOCK_THRESHOLD and stock_name not in stocks_temp:
+                    stocks_temp[stock_name] = stock_ex
+                    count += 1
+        # drop batches still waiting for a worker once enough stocks have been found
+        for future in futures:
+            future.cancel()
     # get back ticker
     for stock in stocks_temp:
         stocks.append(f"{stock}")
@@ -266,14 +428,14 @@ def main():
         if args.t:
             Notify.for_input("Check Market? (y/n) : ")
             confirm = input().strip().lower()
-            print("")
+            Notify.write()
         else:
             confirm = "y"
         if is_open() or confirm == "n":
             pass
         else:
             Notify.fatal("Market is closed at the moment, aborting.")
-            print("")
+            Notify.write()
             quit(0)
     # else:
     #     Notify.warn("You are in developer mode, if not intended, please quit.")
@@ -287,7 +449,7 @@ def main():
         Notify.info(f"Entered Idle phase at {datetime.datetime.now(TZ).strftime('%H:%M:%S')}")
         master_logger.info(f"Entered Idle phase")
         Notify.info(f"\tExpected release : after {IDLE_DELAY // 60} minutes")
-        print("")
+        Notify.write()
         sleep(IDLE_DELAY)
 
     master_logger.info("Idle phase complete")
@@ -296,21 +458,28 @@ def main():
     try:
         stocks_to_focus = fetch_stocks()
     except Exception as ex:
-        print(f'Exception was {ex}')
+        Notify.write(f'Exception was {ex}')
         stocks_to_focus = []
         Notify.fatal("Could not fetch relevant stocks. Verify Network connection and check logs for details.")
         master_logger.critical("Could not fetch relevant stocks, Most possibly due to network error")
         quit(0)
     Notify.info("\tStatus : Complete")
     master_logger.info("Successfully found relevant stocks")
-    print("")
+    master_logger.debug("HTTP connection stats : %s", session_stats())
+    Notify.write()
 
     # setup traders and begin trade
-    master = Master(PERIOD_INTERVAL, master_logger, FEASIBLE_PERCENT, ACCOUNT, PACK_UP, DEV_MODE)
+    from master import Master
+    master = Master(PERIOD_INTERVAL, master_logger, FEASIBLE_PERCENT, ACCOUNT, PACK_UP, DEV_MODE, args.workers, args.book,
+                    args.stagger, args.overrun)
     master.validate_repo()
     master.lineup_traders(stocks_to_focus)
-    master.init_traders(args.t)
-    master.start_trading(args.t)
+    from library.profiling import get_profiler
+    # reports of each phase are written to the directory of the day as the phase ends
+    with get_profiler().phase("observation"):
+        master.init_traders(args.t, args.warm_start)
+    with get_profiler().phase("trading", sample=True):
+        master.start_trading(args.t)
 
     # trading in over by this point
     Notify.info("Trading complete")
@@ -322,6 +491,7 @@ def main():
 
 
 if __name__ == "__main__":
+    setup()
     try:
         main()
     except KeyboardInterrupt:
@@ -331,4 +501,4 @@ if __name__ == "__main__":
     except Exception as err:
         Notify.fatal("Encountered fatal error. Check log for details. Aborting")
 
-        master_logger.critical("Trade abort due to unexpected error : ", err)
+        master_logger.critical("Trade abort due to unexpected error : %s", err)
@@ -0,0 +1,155 @@
+import argparse
+import json
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from library import Notify
+from library.sources import find_captures, load_capture
+from trader import Trader, DATA_LIMIT
+
+##############################################################
+
+# money allotted to each trader
+ACCOUNT = 1000
+# previous day's data of a trader starting without any open trade
+NO_OPEN_TRADES = {"stocks_to_sell": dict(), "stocks_to_buy_back": dict()}
+
+##############################################################
+
+
+class ReplayTrader(Trader):
+    """
+        Trader fed from a recorded capture, runs the live strategy without network, sleeps or files and keeps its
+        trades in memory
+    """
+
+    __slots__ = ("now", "trades", "cash_outs")
+
+    def __init__(self, ticker, account):
+        logger = logging.getLogger(f"backtest.{ticker}")
+        logger.setLevel(logging.CRITICAL)
+        logger.propagate = False
+        if not logger.handlers:
+            logger.addHandler(logging.NullHandler())
+        super().__init__(0, ticker, account, prev_data=NO_OPEN_TRADES, logger=logger)
+        # time of day of the tick being replayed
+        self.now = None
+        self.trades = list()
+        self.cash_outs = 0
+
+    def timestamp(self):
+        return self.now
+
+    def record(self, action, trade, price):
+        self.trades.append({"time": self.now, "action": action, "trade": trade, "price": price})
+
+    def out_of_cash(self, message):
+        self.cash_outs += 1
+
+    def __del__(self):
+        pass
+
+
+def replay(ticker, ticks, account=ACCOUNT):
+    """
+        Replay ticks through the Kumo breakout strategy of Trader
+    Args:
+        ticker: ticker of the stock
+        ticks: list of (time of day, price) in chronological order
+        account: money allotted to the trader
+
+    Returns:
+        dict with the trades, the trader's PnL with open trades marked at the last price, and the open trade if any
+
+    """
+    trader = ReplayTrader(ticker, account)
+    # observation phase, then one round per tick
+    for now, price in ticks[:DATA_LIMIT]:
+        trader.now = now
+        trader.get_initial_data(price)
+    for now, price in ticks[DATA_LIMIT:]:
+        trader.now = now
+        trader.run(price)
+
+    pnl = trader.account - account
+    open_trade = None
+    if len(ticks) > DATA_LIMIT:
+        last_price = ticks[-1][1]
+        if trader.IN_LONG_TRADE:
+            pnl += last_price
+            open_trade = "LONG"
+        if trader.IN_SHORT_TRADE:
+            pnl -= last_price
+            open_trade = "SHORT" if open_trade is None else "LONG, SHORT"
+    return {
+        "ticker": ticker,
+        "ticks": len(ticks),
+        "trades": trader.trades,
+        "pnl": pnl,
+        "open": open_trade,
+        "cash_outs": trader.cash_outs
+    }
+
+
+def backtest_file(path, account=ACCOUNT):
+    capture = load_capture(path)
+    if capture is None:
+        return None
+    result = replay(*capture, account=account)
+    result["day"] = os.path.basename(os.path.dirname(os.path.abspath(path)))
+    result["file"] = path
+    return result
+
+
+def backtest(paths, account=ACCOUNT, workers=None):
+    """
+        Backtest every capture found under the given files and directories, spread over a pool of processes
+    Args:
+        paths: capture files or directories containing them
+        account: money allotted to each trader
+        workers: number of processes, defaults to the number of CPUs
+
+    Returns:
+        list of replay results, one per capture, and dict of results summed per ticker
+
+    """
+    captures = find_captures(paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = [result for result in executor.map(backtest_file, captures, [account] * len(captures),
+                                                       chunksize=max(len(captures) // 64, 1)) if result is not None]
+    summary = OrderedDict()
+    for result in sorted(results, key=lambda r: (r["ticker"], r["day"])):
+        total = summary.setdefault(result["ticker"], {"days": 0, "trades": 0, "pnl": 0})
+        total["days"] += 1
+        total["trades"] += len(result["trades"])
+        total["pnl"] += result["pnl"]
+    return results, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="backtest.py",
+                                     description="Replay edartMine captures through the Kumo breakout strategy")
+    parser.add_argument("paths", nargs="+", help="Capture files or directories containing them")
+    parser.add_argument("--account", type=float, default=ACCOUNT, help="Money allotted to each trader")
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes, defaults to CPU count")
+    parser.add_argument("--output", default=None, help="Write trades and PnL of every capture to this JSON file")
+    args = parser.parse_args()
+
+    results, summary = backtest(args.paths, args.account, args.workers)
+    Notify.info(f"Replayed {len(results)} captures of {len(summary)} tickers", delay=0)
+    Notify.flush()
+    print("")
+    print(f"{'TICKER':<12}{'DAYS':>6}{'TRADES':>8}{'PNL':>14}")
+    for ticker, total in summary.items():
+        print(f"{ticker:<12}{total['days']:>6}{total['trades']:>8}{total['pnl']:>14.4f}")
+    print(f"{'TOTAL':<12}{'':>6}{sum(t['trades'] for t in summary.values()):>8}"
+          f"{sum(t['pnl'] for t in summary.values()):>14.4f}")
+    if args.output is not None:
+        with open(args.output, "w") as fp:
+            fp.write(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+import argparse
+import atexit
+import datetime
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from collections import OrderedDict
+from concurrent.futures import Future
+from time import perf_counter
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from backtest import ReplayTrader
+from book import TraderBook
+from library import ichimoku_lines, set_source
+from library.ichimoku import cache
+from library.model import BatchModel, Model
+from library.si import parse_data
+from library.sources import SyntheticSource, load_capture
+from library.tickstore import TickStore
+from master import Master
+from trader import DATA_LIMIT
+
+##############################################################
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# allowed slowdown against the baseline before a benchmark counts as a regression
+THRESHOLD = 0.25
+# number of values worked through by the calibration loop
+CALIBRATION_SIZE = 50000
+# extra peak memory tolerated on top of the threshold, in bytes
+MEMORY_SLACK = 64 * 1024
+# time spent repeating each benchmark, in seconds
+BUDGET = 0.2
+# shortest timed sample, calls are batched until a sample takes at least this long, in seconds
+MIN_SAMPLE = 0.005
+# fresh processes a baseline is recorded over
+UPDATE_RUNS = 5
+# bounds on the number of timed samples
+MIN_REPEAT = 11
+MAX_REPEAT = 1000
+
+##############################################################
+
+
+class InlineExecutor:
+    """
+        Executor running every call on the calling thread as it is submitted
+    """
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class BenchMaster(Master):
+    """
+        Master without the end of session bookkeeping, which reads and writes user_info.json. Prices are fetched on
+        the calling thread, the synthetic source does not wait on anything and the threads of the fetch pool would
+        only add their own allocations and scheduling to the measure
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.executor.shutdown()
+        self.executor = InlineExecutor()
+
+    def __del__(self):
+        self.executor.shutdown(wait=False)
+
+
+def load_prices(length):
+    """
+        Captured prices of the fixture, repeated up to the given length
+    """
+    prices = [price for _, price in load_capture(os.path.join(FIXTURES, "capture.json"))[1]]
+    return (prices * (length // len(prices) + 1))[:length]
+
+
+def null_logger(name):
+    logger = logging.getLogger(f"benchmark.{name}")
+    logger.setLevel(logging.CRITICAL)
+    logger.propagate = False
+    if not logger.handlers:
+        logger.addHandler(logging.NullHandler())
+    return logger
+
+
+def bench_make_decision(_):
+    # the trader keeps a window of DATA_LIMIT prices whatever it has seen, so only one size is measured
+    trader = ReplayTrader("BENCH", 10 ** 9)
+    for price in load_prices(DATA_LIMIT + 1):
+        trader.get_initial_data(price)
+    return trader.make_decision
+
+
+def plot_chart(window):
+    sys.path.insert(0, os.path.join(ROOT, "edartPlot"))
+    from script import Ichimoku
+    # skip __init__, which only configures the matplotlib style
+    plot = Ichimoku.__new__(Ichimoku)
+    plot.ticker = "BENCH"
+    plot.data = load_prices(window)
+    plot.len_data = window
+    return plot
+
+
+def bench_prepare_data(window):
+    plot = plot_chart(window)
+
+    def prepare():
+        # every call computes the lines, not only the first one
+        cache.clear()
+        plot.prepare_data()
+
+    return prepare
+
+
+def bench_prepare_data_cached(window):
+    plot = plot_chart(window)
+    plot.prepare_data()
+    return plot.prepare_data
+
+
+def model_states(count):
+    """
+        Snapshots of the Ichimoku lines over the captured prices, with random previous states
+    """
+    prices = load_prices(count + 2 * DATA_LIMIT)
+    lines = ichimoku_lines(prices)
+    states = list()
+    for t in range(DATA_LIMIT, DATA_LIMIT + count):
+        states.append((prices[t], lines.tenkan[t], lines.kijun[t], lines.senkou_A[t - 26], lines.senkou_B[t - 26],
+                       prices[t - 26], random.choice((-1, 0, 1)), random.choice((-1, 0, 1)),
+                       random.choice((-1, 0, 1)), random.choice((-1, 0, 1)), lines.senkou_A[t], lines.senkou_B[t]))
+    return states
+
+
+def bench_ichimoku_lines(window):
+    prices = load_prices(window)
+    return lambda: ichimoku_lines(prices)
+
+
+def bench_get_conf(count):
+    states = model_states(count)
+
+    def score():
+        return [Model(*state).get_conf() for state in states]
+
+    return score
+
+
+def bench_batch_conf(count):
+    series = [np.array(column) for column in zip(*model_states(count))]
+    return lambda: BatchModel(*series).get_conf()
+
+
+def bench_store_load(tickers):
+    root = tempfile.mkdtemp(prefix="edart-bench-")
+    atexit.register(shutil.rmtree, root, True)
+    store = TickStore(root)
+    prices = load_prices(DATA_LIMIT * 100)
+    for i in range(tickers):
+        store.append(f"SYN{i}", np.arange(len(prices)), prices)
+
+    def load():
+        return [store.load(ticker)[1][-1] for ticker in store.tickers()]
+
+    return load
+
+
+def bench_parse_data(bars):
+    with open(os.path.join(FIXTURES, "chart_1d.json"), "r") as fp:
+        data = json.loads(fp.read())
+    result = data["chart"]["result"][0]
+    result["timestamp"] = result["timestamp"][-bars:]
+    quote = result["indicators"]["quote"][0]
+    for key in quote:
+        quote[key] = quote[key][-bars:]
+    result["indicators"]["adjclose"][0]["adjclose"] = result["indicators"]["adjclose"][0]["adjclose"][-bars:]
+    return lambda: parse_data(data, "BENCH")
+
+
+def bench_master_round(tickers):
+    source = SyntheticSource(seed=0, tickers=[f"SYN{i}" for i in range(tickers)])
+    set_source(source)
+    master = BenchMaster(0, null_logger("master"), 0.2, 10 ** 9, datetime.time(23, 59), False)
+    for ticker in source.candidates():
+        trader = ReplayTrader(ticker, 10 ** 9)
+        for _ in range(DATA_LIMIT):
+            trader.get_initial_data(source.get_price(ticker))
+        master.traders.append(trader)
+    return lambda: master.run_round(0)
+
+
+def bench_book_step(tickers):
+    prices = np.array(load_prices(DATA_LIMIT + 1))
+    # one shifted copy of the captured prices per ticker
+    window = np.array([np.roll(prices, i) for i in range(tickers)])
+    book = TraderBook([f"SYN{i}" for i in range(tickers)], 10 ** 9)
+    for column in window[:, :DATA_LIMIT].T:
+        book.append(column)
+    return lambda: book.step(window[:, DATA_LIMIT])
+
+
+BENCHMARKS = OrderedDict()
+BENCHMARKS["trader.make_decision"] = (bench_make_decision, None)
+for window in (390, 3900, 39000):
+    BENCHMARKS[f"plot.prepare_data[window={window}]"] = (bench_prepare_data, window)
+BENCHMARKS["plot.prepare_data[cached]"] = (bench_prepare_data_cached, 3900)
+for window in (390, 39000):
+    BENCHMARKS[f"ichimoku.lines[window={window}]"] = (bench_ichimoku_lines, window)
+for tickers in (5, 500, 5000):
+    BENCHMARKS[f"book.step[tickers={tickers}]"] = (bench_book_step, tickers)
+for count in (390, 3900):
+    BENCHMARKS[f"model.get_conf[snapshots={count}]"] = (bench_get_conf, count)
+for count in (390, 3900, 390000):
+    BENCHMARKS[f"model.batch_conf[snapshots={count}]"] = (bench_batch_conf, count)
+for tickers in (50, 500):
+    BENCHMARKS[f"tickstore.load[tickers={tickers}]"] = (bench_store_load, tickers)
+for bars in (250, 1000):
+    BENCHMARKS[f"si.parse_data[bars={bars}]"] = (bench_parse_data, bars)
+for tickers in (5, 50, 500):
+    BENCHMARKS[f"master.run_round[tickers={tickers}]"] = (bench_master_round, tickers)
+
+##############################################################
+
+
+def timed(func, calls):
+    start = perf_counter()
+    for _ in range(calls):
+        func()
+    return perf_counter() - start
+
+
+def batch(func):
+    """
+        Number of calls timed together, so that a sample takes at least MIN_SAMPLE
+    """
+    calls = 1
+    while timed(func, calls) < MIN_SAMPLE:
+        calls *= 2
+    return calls
+
+
+def measure(func, unit):
+    """
+        Time a callable against the calibration loop and track its peak memory. Calls are timed in batches long enough
+        for the resolution of the timer not to matter, every batch is paired with a batch of the calibration loop timed
+        right before it, so that neighbours slowing the machine down slow both alike, and the median of the pairs is
+        kept
+    Args:
+        func: callable to measure
+        unit: calibration loop
+
+    Returns:
+        median time of a call in seconds, median ratio of the time of a call to the time of the calibration loop,
+        and peak memory allocated during one call in bytes
+
+    """
+    calls, unit_calls = batch(func), batch(unit)
+    # one untimed pair first, caches and lazy imports are warm by the time samples are taken
+    timed(unit, unit_calls)
+    timed(func, calls)
+    times, ratios = list(), list()
+    spent = 0
+    while len(times) < MIN_REPEAT or (spent < BUDGET and len(times) < MAX_REPEAT):
+        reference = timed(unit, unit_calls) / unit_calls
+        elapsed = timed(func, calls)
+        times.append(elapsed / calls)
+        ratios.append(times[-1] / reference)
+        spent += elapsed + reference * unit_calls
+    # allocation tracking slows calls down, so peak memory is measured on a separate call
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(times), statistics.median(ratios), peak
+
+
+def calibration():
+    """
+        Fixed mix of interpreted and NumPy work, timings are stored relative to it so that a baseline recorded on one
+        machine still holds on a faster or slower one
+    """
+    values = np.random.default_rng(0).random(CALIBRATION_SIZE)
+    numbers = values.tolist()
+
+    def work():
+        total = 0.0
+        for value in numbers:
+            total += value * value
+        return total, np.sort(values)
+
+    return work
+
+
+def run(pattern, baseline, threshold, quiet=False):
+    """
+        Run the benchmarks whose name contains pattern and compare them to the baseline
+    Returns:
+        dict of the results of every benchmark run, and list of the names of those which regressed
+
+    """
+    random.seed(0)
+    unit = calibration()
+    results = OrderedDict()
+    regressions = list()
+    if not quiet:
+        print(f"{'BENCHMARK':<40}{'TIME (ms)':>12}{'PEAK (KiB)':>12}{'BASELINE':>12}")
+    for name, (setup, param) in BENCHMARKS.items():
+        if pattern not in name:
+            continue
+        func = setup(param)
+        elapsed, relative, peak = measure(func, unit)
+        results[name] = {"relative": relative, "peak": peak}
+        change = ""
+        if name in baseline:
+            base = baseline[name]
+            change = f"{(relative / base['relative'] - 1) * 100:+.1f}%"
+            if relative > base["relative"] * (1 + threshold) or peak > base["peak"] * (1 + threshold) + MEMORY_SLACK:
+                regressions.append(name)
+                change += " !"
+        if not quiet:
+            print(f"{name:<40}{elapsed * 1000:>12.3f}{peak / 1024:>12.1f}{change:>12}")
+    return results, regressions
+
+
+def record(pattern, runs):
+    """
+        Results of the benchmarks over several fresh processes, the median time and the largest peak of each. The
+        speed of a process varies with where it lands in memory and on the machine, more than runs within a process
+    """
+    samples = list()
+    for i in range(runs):
+        print(f"Recording run {i + 1} of {runs}")
+        command = [sys.executable, os.path.abspath(__file__), "--record", "-k", pattern]
+        samples.append(json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout))
+    return OrderedDict((name, {"relative": statistics.median(sample[name]["relative"] for sample in samples),
+                               "peak": max(sample[name]["peak"] for sample in samples)}) for name in samples[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="run.py", description="Benchmark the strategy and data hot paths")
+    parser.add_argument("--update", action="store_true",
+                        help="Store the results of several runs in fresh processes as the new baseline")
+    parser.add_argument("--runs", type=int, default=UPDATE_RUNS, help="Number of runs the baseline is recorded over")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="Allowed slowdown against the baseline, as a fraction")
+    parser.add_argument("-k", dest="pattern", default="", help="Only run benchmarks whose name contains this")
+    # a single run printing its results as JSON, for the runs of an update
+    parser.add_argument("--record", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.record:
+        print(json.dumps(run(args.pattern, dict(), args.threshold, quiet=True)[0]))
+        return
+
+    baseline = dict()
+    if os.path.exists(BASELINE):
+        with open(BASELINE, "r") as fp:
+            baseline = json.loads(fp.read())
+
+    if args.update:
+        # entries of benchmarks which no longer exist are dropped
+        baseline = {name: entry for name, entry in baseline.items() if name in BENCHMARKS}
+        baseline.update(record(args.pattern, args.runs))
+        with open(BASELINE, "w") as fp:
+            fp.write(json.dumps(baseline, indent=4))
+        print(f"\nBaseline updated : {BASELINE}")
+        return
+
+    _, regressions = run(args.pattern, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold * 100:.0f}% : {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
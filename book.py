@@ -0,0 +1,165 @@
+from collections import namedtuple
+
+import numpy as np
+
+from library.ichimoku import IchimokuStream, latest_mid, TENKAN_PERIOD, KIJUN_PERIOD, SENKOU_B_PERIOD, DISPLACEMENT
+from trader import DATA_LIMIT, BUFFER_PERCENT
+
+Order = namedtuple("Order", ["index", "ticker", "action", "trade", "price"])
+
+
+class TraderBook:
+    """
+        Structure of arrays holding the price windows, position flags and buffers of all traders, the Kumo breakout
+        rules of Trader.make_decision are evaluated for every ticker at once with boolean masks
+
+    Args:
+        tickers: tickers of the traders, in order
+        account: money allotted to each trader
+        window: number of prices kept per ticker
+    """
+
+    def __init__(self, tickers, account, window=DATA_LIMIT):
+        count = len(tickers)
+        self.tickers = list(tickers)
+        self.window = window
+        # price windows, every column is stored twice, window apart, so the window is one contiguous slice
+        self.prices = np.zeros((count, 2 * window))
+        self.start = 0
+        self.length = 0
+        self.account = np.full(count, account, dtype=float)
+        self.in_long = np.zeros(count, dtype=bool)
+        self.in_short = np.zeros(count, dtype=bool)
+        self.stocks_to_sell = np.zeros(count, dtype=int)
+        self.stocks_to_buy_back = np.zeros(count, dtype=int)
+        self.price_for_buffer = np.zeros(count)
+        self.sold_price = np.zeros(count)
+        self.bought_price = np.zeros(count)
+        self.rounds = np.zeros(count, dtype=int)
+
+    @classmethod
+    def from_traders(cls, traders):
+        """
+            Build a book holding the price windows and state of the given traders
+        """
+        book = cls([trader.ticker for trader in traders], 0)
+        for column in np.array([trader.price.view() for trader in traders]).T:
+            book.append(column)
+        for i, trader in enumerate(traders):
+            book.account[i] = trader.account
+            book.in_long[i] = trader.IN_LONG_TRADE
+            book.in_short[i] = trader.IN_SHORT_TRADE
+            book.stocks_to_sell[i] = trader.STOCKS_TO_SELL
+            book.stocks_to_buy_back[i] = trader.STOCKS_TO_BUY_BACK
+            book.price_for_buffer[i] = trader.price_for_buffer
+            book.sold_price[i] = trader.sold_price
+            book.bought_price[i] = trader.bought_price
+            book.rounds[i] = trader.rounds
+        return book
+
+    def sync(self, traders):
+        """
+            Write the price windows and state held by the book back into the given traders, which can go on trading
+            from where the book stopped
+        """
+        view = self.view()
+        for i, trader in enumerate(traders):
+            # the Ichimoku components only depend on the window, so the stream is rebuilt from it
+            trader.ichimoku = IchimokuStream()
+            for price in view[i].tolist():
+                trader.price.append(price)
+                trader.ichimoku.push(price)
+            trader.rounds = self.rounds[i].item()
+            trader.account = self.account[i].item()
+            trader.IN_LONG_TRADE = bool(self.in_long[i])
+            trader.IN_SHORT_TRADE = bool(self.in_short[i])
+            trader.STOCKS_TO_SELL = self.stocks_to_sell[i].item()
+            trader.STOCKS_TO_BUY_BACK = self.stocks_to_buy_back[i].item()
+            trader.price_for_buffer = self.price_for_buffer[i].item()
+            trader.sold_price = self.sold_price[i].item()
+            trader.bought_price = self.bought_price[i].item()
+
+    def append(self, prices):
+        """
+            Add a column with the latest price of every ticker, evicting the oldest column of a full window
+        """
+        if self.length == self.window:
+            self.start = (self.start + 1) % self.window
+            self.length -= 1
+        slot = (self.start + self.length) % self.window
+        self.prices[:, slot] = prices
+        self.prices[:, slot + self.window] = prices
+        self.length += 1
+
+    def view(self):
+        return self.prices[:, self.start:self.start + self.length]
+
+    def latest(self):
+        return self.prices[:, (self.start + self.length - 1) % self.window]
+
+    def step(self, prices):
+        """
+            Append the latest prices and decide for every ticker, in the order Trader.make_decision does
+        Args:
+            prices: array with the latest price of every ticker
+
+        Returns:
+            list of Order in execution order, and list of (index, message) of traders out of cash
+
+        """
+        self.append(prices)
+        self.rounds += 1
+        view = self.view()
+        if view.shape[1] < SENKOU_B_PERIOD + DISPLACEMENT + 1:
+            raise ValueError("Not enough prices in the book to compute Ichimoku components")
+        # Ichimoku components lag the live price by one period, leading spans are displaced on top of that
+        past = -1 - DISPLACEMENT
+        curr_price = view[:, -1]
+        kijun = latest_mid(view, -1, KIJUN_PERIOD)
+        sen_A = (latest_mid(view, past, TENKAN_PERIOD) + latest_mid(view, past, KIJUN_PERIOD)) / 2
+        sen_B = latest_mid(view, past, SENKOU_B_PERIOD)
+
+        # strong bullish and bearish signals, and allocated money
+        cond1 = (sen_A > sen_B) & (curr_price >= sen_A)
+        cond2 = (sen_A < sen_B) & (curr_price <= sen_A)
+        cond3 = curr_price < self.account
+
+        orders = list()
+        cash_outs = [(i, "Trader out of cash to buy stocks!") for i in np.flatnonzero(~cond3)]
+
+        # long trade entry
+        mask = cond1 & ~self.in_long & cond3
+        self.account[mask] -= curr_price[mask]
+        self.bought_price[mask] = curr_price[mask]
+        self.price_for_buffer[mask] = curr_price[mask]
+        self.in_long |= mask
+        self.stocks_to_sell[mask] += 1
+        orders.extend(self.orders(mask, "BUY", "LONG", curr_price))
+        # short trade entry
+        mask = cond2 & ~self.in_short
+        self.account[mask] += curr_price[mask]
+        self.sold_price[mask] = curr_price[mask]
+        self.price_for_buffer[mask] = curr_price[mask]
+        self.in_short |= mask
+        self.stocks_to_buy_back[mask] += 1
+        orders.extend(self.orders(mask, "SELL", "SHORT", curr_price))
+
+        # stop loss and trade exit as the price moves through the buffer area beyond the kijun
+        cond4 = np.abs(curr_price - kijun) >= self.price_for_buffer * BUFFER_PERCENT
+        mask = self.in_long & cond4
+        self.account[mask] += curr_price[mask]
+        self.sold_price[mask] = curr_price[mask]
+        self.in_long &= ~mask
+        self.stocks_to_sell[mask] -= 1
+        orders.extend(self.orders(mask, "SELL", "LONG", curr_price))
+        cash_outs.extend((i, "Trader out of cash to buy back stock !") for i in np.flatnonzero(self.in_short & ~cond3))
+        mask = self.in_short & cond4 & cond3
+        self.account[mask] -= curr_price[mask]
+        self.bought_price[mask] = curr_price[mask]
+        self.in_short &= ~mask
+        self.stocks_to_buy_back[mask] -= 1
+        orders.extend(self.orders(mask, "BUY", "SHORT", curr_price))
+        return orders, cash_outs
+
+    def orders(self, mask, action, trade, prices):
+        return [Order(i, self.tickers[i], action, trade, prices[i].item()) for i in np.flatnonzero(mask)]
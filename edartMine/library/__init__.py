@@ -1,3 +1,38 @@
-from .si import get_live_price
-from .loggers import master_logger, trader_logger
-from .notifications import Notify
+import importlib
+
+# module of every name exported by the package, modules are imported when one of their names is first used, so
+# importing the package stays cheap and heavy dependencies load only on the code paths that need them
+EXPORTS = {
+    "get_live_price": "si",
+    "get_live_prices": "si",
+    "get_recent_closes": "si",
+    "configure_session": "session",
+    "get_session": "session",
+    "session_stats": "session",
+    "configure_history": "history",
+    "get_history": "history",
+    "get_source": "sources",
+    "make_source": "sources",
+    "set_source": "sources",
+    "json_sink": "loggers",
+    "master_logger": "loggers",
+    "trader_logger": "loggers",
+    "Notify": "notifications",
+    "Scheduler": "scheduler",
+    "TickReader": "ticks",
+    "TickWriter": "ticks",
+}
+
+__all__ = list(EXPORTS)
+
+
+def __getattr__(name):
+    if name not in EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(EXPORTS))
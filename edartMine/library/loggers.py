@@ -1,4 +1,19 @@
+import atexit
+import copy
+import json
 import logging
+import os
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+from queue import Empty, Queue
+
+
+# number of log files kept open by the writer, least recently used ones are closed beyond it
+MAX_OPEN_FILES = 32
+# number of records written before the touched files are flushed
+BATCH_SIZE = 512
 
 
 class LoggerFormatter(logging.Formatter):
@@ -14,23 +29,186 @@ class LoggerFormatter(logging.Formatter):
 		return '[%s] [%s] %s :: %s' % (time, level, ''.ljust(padding), record.getMessage())
 
 
-def master_logger(path):
-	logger = logging.getLogger(path)
-	logger.setLevel(logging.DEBUG)
-	fh = logging.FileHandler(path)
-	fh.setLevel(logging.DEBUG)
-	fh.setFormatter(LoggerFormatter())
-	logger.addHandler(fh)
+class JsonFormatter(logging.Formatter):
+	def format(self, record):
+		return json.dumps({
+			"time": round(record.created, 6),
+			"level": record.levelname,
+			"logger": record.name,
+			"message": record.getMessage()
+		}, separators=(',', ':'))
 
-	return logger
 
+class LogWriter:
+	"""
+		Background thread owning every log file. Records are queued with their message built by the logging threads,
+		then formatted, written in batches and flushed once per batch by the writer, which keeps a bounded number of
+		files open
+	"""
 
-def trader_logger(ticker):
-	logger = logging.getLogger(f"{ticker}.log")
+	def __init__(self, max_open=MAX_OPEN_FILES, batch=BATCH_SIZE):
+		self.max_open = max_open
+		self.batch = batch
+		self.queue = Queue()
+		self.formatter = LoggerFormatter()
+		self.json_formatter = JsonFormatter()
+		# log file of each logger, and the optional JSON lines file shared by all of them
+		self.paths = dict()
+		self.json_path = None
+		# open files, least recently used first
+		self.files = OrderedDict()
+		self.thread = None
+		self.closed = False
+		self.lock = threading.Lock()
+
+	def register(self, name, path):
+		self.paths[name] = os.path.abspath(path)
+
+	def put(self, record):
+		with self.lock:
+			# records arriving after the writer has been closed at exit are written right away
+			if self.closed:
+				lines = OrderedDict()
+				self.format(record, lines)
+				self.write(lines)
+				return
+			if self.thread is None:
+				self.thread = threading.Thread(target=self.run, name="log-writer", daemon=True)
+				self.thread.start()
+		self.queue.put_nowait(record)
+
+	def open(self, path):
+		fp = self.files.get(path)
+		if fp is None:
+			if len(self.files) >= self.max_open:
+				self.files.popitem(last=False)[1].close()
+			fp = open(path, "a", encoding="utf-8")
+			self.files[path] = fp
+		else:
+			self.files.move_to_end(path)
+		return fp
+
+	def format(self, record, lines):
+		path = self.paths.get(record.name)
+		if path is not None:
+			lines.setdefault(path, list()).append(self.formatter.format(record) + "\n")
+		if self.json_path is not None:
+			lines.setdefault(self.json_path, list()).append(self.json_formatter.format(record) + "\n")
+
+	def write(self, lines):
+		for path, batch in lines.items():
+			fp = self.open(path)
+			fp.writelines(batch)
+			fp.flush()
+
+	def run(self):
+		running = True
+		while running:
+			records = [self.queue.get()]
+			# drain whatever else is waiting, up to a batch
+			while len(records) < self.batch:
+				try:
+					records.append(self.queue.get_nowait())
+				except Empty:
+					break
+			# lines of the batch grouped by file, so that each file is opened and flushed once per batch
+			lines = OrderedDict()
+			for record in records:
+				if record is None:
+					running = False
+					continue
+				try:
+					self.format(record, lines)
+				except Exception:
+					traceback.print_exc(file=sys.stderr)
+			try:
+				self.write(lines)
+			except Exception:
+				traceback.print_exc(file=sys.stderr)
+			for _ in records:
+				self.queue.task_done()
+		for fp in self.files.values():
+			fp.close()
+		self.files.clear()
+
+	def flush(self):
+		"""
+			Wait until every queued record has been written
+		"""
+		if self.thread is not None and self.thread.is_alive():
+			self.queue.join()
+
+	def close(self):
+		if self.thread is not None and self.thread.is_alive():
+			self.queue.put_nowait(None)
+			self.thread.join()
+		with self.lock:
+			self.closed = True
+
+
+class WriterHandler(logging.Handler):
+	"""
+		Hands records over to the writer, prepared the way logging.handlers.QueueHandler prepares them
+	"""
+
+	def __init__(self, writer):
+		super().__init__()
+		self.writer = writer
+		self.exception_formatter = logging.Formatter()
+
+	def prepare(self, record):
+		"""
+			Copy of a record with its message built and its traceback appended, arguments may change and tracebacks
+			may be gone by the time the writer gets to the record
+		"""
+		message = record.getMessage()
+		if record.exc_info:
+			message += "\n" + self.exception_formatter.formatException(record.exc_info)
+		elif record.exc_text:
+			message += "\n" + record.exc_text
+		if record.stack_info:
+			message += "\n" + self.exception_formatter.formatStack(record.stack_info)
+		record = copy.copy(record)
+		record.msg = message
+		record.args = None
+		record.exc_info = None
+		record.exc_text = None
+		record.stack_info = None
+		return record
+
+	def emit(self, record):
+		try:
+			self.writer.put(self.prepare(record))
+		except Exception:
+			self.handleError(record)
+
+
+writer = LogWriter()
+atexit.register(writer.close)
+
+
+def json_sink(path):
+	"""
+		Additionally write every record of every logger to a compact JSON lines file, None to stop
+	"""
+	writer.json_path = os.path.abspath(path) if path is not None else None
+
+
+def queue_logger(name, path):
+	logger = logging.getLogger(name)
 	logger.setLevel(logging.DEBUG)
-	fh = logging.FileHandler(f"{ticker}.log")
-	fh.setLevel(logging.DEBUG)
-	fh.setFormatter(LoggerFormatter())
-	logger.addHandler(fh)
+	writer.register(name, path)
+	if not any(isinstance(handler, WriterHandler) for handler in logger.handlers):
+		handler = WriterHandler(writer)
+		handler.setLevel(logging.DEBUG)
+		logger.addHandler(handler)
 
 	return logger
+
+
+def master_logger(path):
+	return queue_logger(path, path)
+
+
+def trader_logger(ticker):
+	return queue_logger(f"{ticker}.log", f"{ticker}.log")
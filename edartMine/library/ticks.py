@@ -0,0 +1,168 @@
+import os
+from time import monotonic
+
+##############################################################
+
+# extension of tick files
+EXTENSION = ".ticks"
+# buffered ticks are written out once this many are waiting
+FLUSH_SIZE = 64
+# buffered ticks are written out once the oldest has waited this long, in seconds
+FLUSH_INTERVAL = 5.0
+
+##############################################################
+
+
+class TickWriter:
+    """
+        Append-only writer of a tick file. The first line holds the ticker, every following line one tick as
+        'time,price'. Ticks are buffered and written out in batches, every batch is flushed to disk, so memory stays
+        bounded and a crash loses at most the ticks still in the buffer. Appending to an existing file resumes it.
+        The age of the buffer is only checked when a tick is written or when the writer is polled, a writer which is
+        not polled between ticks holds them for up to the interval plus the time between ticks
+
+    Args:
+        path: path of the tick file
+        ticker: ticker the ticks belong to
+        size: number of buffered ticks which triggers a write
+        interval: age of the oldest buffered tick which triggers a write, in seconds
+    """
+
+    def __init__(self, path, ticker, size=FLUSH_SIZE, interval=FLUSH_INTERVAL):
+        self.path = path
+        self.ticker = ticker
+        self.size = size
+        self.interval = interval
+        self.buffer = list()
+        self.since = None
+        # drop the line cut short by a crash before resuming the file
+        if os.path.exists(path):
+            truncate_partial(path)
+        self.fp = open(path, "a")
+        if self.fp.tell() == 0:
+            self.fp.write(f"{ticker}\n")
+            self.sync()
+
+    def write(self, time, price):
+        if not self.buffer:
+            self.since = monotonic()
+        self.buffer.append(f"{time},{price!r}\n")
+        if len(self.buffer) >= self.size:
+            self.flush()
+        else:
+            self.poll()
+
+    def poll(self):
+        """
+            Write out the buffer if its oldest tick has waited the interval, for callers idling between ticks
+        """
+        if self.buffer and monotonic() - self.since >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.fp.write("".join(self.buffer))
+            self.buffer.clear()
+            self.sync()
+
+    def sync(self):
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+
+    def close(self):
+        if not self.fp.closed:
+            self.flush()
+            self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TickReader:
+    """
+        Incremental reader of a tick file, a line cut short by a crash or by a write in progress is left for later
+
+    Args:
+        path: path of the tick file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.ticker = None
+        # position up to which the file has been consumed
+        self.offset = 0
+
+    def poll(self):
+        """
+            Read the ticks written since the previous call
+        Returns:
+            list of (time of day, price)
+
+        """
+        ticks = list()
+        with open(self.path, "rb") as fp:
+            fp.seek(self.offset)
+            for line in fp:
+                if not line.endswith(b"\n"):
+                    break
+                self.offset += len(line)
+                line = line.decode().rstrip("\n")
+                if self.ticker is None:
+                    self.ticker = line
+                    continue
+                tick = parse_tick(line)
+                if tick is not None:
+                    ticks.append(tick)
+        return ticks
+
+    def __iter__(self):
+        """
+            Stream every complete tick of the file from the start, without holding the whole file in memory
+        """
+        with open(self.path, "r") as fp:
+            self.ticker = fp.readline().rstrip("\n")
+            for line in fp:
+                if not line.endswith("\n"):
+                    return
+                tick = parse_tick(line.rstrip("\n"))
+                if tick is not None:
+                    yield tick
+
+
+def parse_tick(line):
+    """
+        Parse a 'time,price' line, None for a line which was cut short
+    """
+    time, _, price = line.partition(",")
+    try:
+        return time, float(price)
+    except ValueError:
+        return None
+
+
+def truncate_partial(path, block=4096):
+    """
+        Cut a file back to the end of its last complete line, reading it backwards one block at a time
+    """
+    with open(path, "rb+") as fp:
+        end = fp.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            step = min(block, position)
+            position -= step
+            fp.seek(position)
+            chunk = fp.read(step)
+            if position + step == end and chunk.endswith(b"\n"):
+                return
+            index = chunk.rfind(b"\n")
+            if index >= 0:
+                fp.truncate(position + index + 1)
+                return
+        fp.truncate(0)
+
+
+def is_tick_file(path):
+    return path.endswith(EXTENSION)
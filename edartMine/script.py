@@ -1,17 +1,20 @@
 # import necessary libraries
-from OpenSSL.SSL import SysCallError
 from clint.textui import puts, colored
-from library.si import get_live_price
+from library.sources import get_source, make_source, set_source
+from library.scheduler import Scheduler
+from library.session import get_session, session_stats, ssl_errors
+from library.ticks import EXTENSION, TickWriter
 from bs4 import BeautifulSoup
 from collections import deque
 from time import sleep
-import requests
+import argparse
 import datetime
-import json
 import os
+import pytz
 
 ##############################################################
 
+TZ = pytz.timezone('Europe/London')
 # set market open time
 OPEN_TIME = datetime.time(hour=9, minute=15, second=0)
 # set market close time
@@ -51,14 +54,14 @@ class Miner:
     def __init__(self, number, ticker):
         self.number = number
         self.ticker = ticker
-        self.database = {"ticker": self.ticker}
-        self.subData = dict()
+        # captured ticks are streamed to disk as they arrive
+        self.writer = TickWriter(self.ticker + EXTENSION, self.ticker)
         Notify.info(f"Initialised Miner #{self.number} with {self.ticker}")
 
     def run(self):
         try:
-            price = get_live_price(self.ticker)
-        except SysCallError:
+            price = get_source().get_price(self.ticker)
+        except ssl_errors():
             Notify.warn(f"[Miner #{self.number} {self.ticker}]: Encountered SysCallError while fetching data, trying recursion")
             self.run()
         except:
@@ -66,14 +69,11 @@ class Miner:
             self.run()
         else:
             now = datetime.datetime.now(TZ)
-            self.subData[now.strftime('%H:%M:%S')] = price
+            self.writer.write(now.strftime('%H:%M:%S'), price)
             # Notify.info(f"[Miner #{self.number} {self.ticker}]: Exception resolved")
 
     def __del__(self):
-        self.database['data'] = self.subData
-        fileName = self.ticker + ".json"
-        with open(fileName, "w") as fp:
-            fp.write(json.dumps(self.database, indent=4))
+        self.writer.close()
 
     def shutdown(self):
         self.__del__()
@@ -87,11 +87,19 @@ class Master:
         for i, stock in enumerate(stocks):
             self.miners.append(Miner(i + 1, stock))
 
-    def run(self, iteration):
-        for miner in self.miners:
+    def run(self, iteration, scheduler):
+        # miners are spread over the staggered part of the period, to smooth out bursts of requests
+        for miner, offset in zip(self.miners, scheduler.offsets(len(self.miners))):
+            if offset:
+                scheduler.sleep_until(scheduler.deadline + offset, self.flush)
             miner.run()
         Notify.info(f"Iteration #{iteration} successful")
 
+    def flush(self):
+        # ticks waiting in a buffer past the flush interval reach the disk between iterations, not on the next tick
+        for miner in self.miners:
+            miner.writer.poll()
+
     def shutdown(self):
         for miner in self.miners:
             miner.shutdown()
@@ -115,12 +123,16 @@ def is_open():
 
 
 def fetch_stocks():
+    # mine the tickers offered by the price source, if it is limited to a known set
+    candidates = get_source().candidates()
+    if candidates is not None:
+        return deque(candidates[:NUM_OF_STOCKS_TO_FOCUS])
     # url to grab data from
     url = f'https://in.finance.yahoo.com/gainers?count={NUM_OF_STOCKS_TO_SEARCH}'
     # request header
     headers = {
         'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/79.0.3945.130 Safari/537.36'}
-    src = requests.get(url=url, headers=headers).content
+    src = get_session().get(url=url, headers=headers).content
     # soup object of source code
     soup = BeautifulSoup(src, "html.parser")
     rows = soup.find('table').tbody.find_all('tr')
@@ -147,7 +159,7 @@ def fetch_stocks():
         else:
             row_data = tr.find_all('td')
             ticker = row_data[0].text.strip()
-            price = get_live_price(ticker)
+            price = get_source().get_price(ticker)
             # split ticker for checking if same stock of different stock exchange is selected or not
             stock_name, stock_ex = ticker.split(".")
             if price >= PENNY_STOCK_THRESHOLD and stock_name not in stocks_temp:
@@ -161,6 +173,16 @@ def fetch_stocks():
 
 
 def main():
+    parser = argparse.ArgumentParser(prog="script.py", description="Capture live stock prices of the top gainers")
+    parser.add_argument("--source", default="live",
+                        help="Source of prices : live, synthetic[:seed] or replay:path[,path...]")
+    parser.add_argument("--stagger", type=float, default=0.0,
+                        help="Fraction of each period the miners of a round are spread over")
+    parser.add_argument("--overrun", choices=("skip", "compress"), default="skip",
+                        help="Skip rounds missed by an overrunning round, or run them back to back")
+    args = parser.parse_args()
+    set_source(make_source(args.source))
+
     val_repo()
     """
     while not is_open():
@@ -192,15 +214,19 @@ def main():
     print("")
     now = datetime.datetime.now(TZ)
     iteration = 1
+    # iterations fire on wall clock deadlines, the time spent mining does not delay the next one
+    scheduler = Scheduler(PERIOD_INTERVAL, args.overrun, args.stagger)
     # for _ in range(5):
     while now.time() < CLOSE_TIME:
-        master.run(iteration)
+        scheduler.wait(master.flush)
+        master.run(iteration, scheduler)
         now = datetime.datetime.now(TZ)
         iteration += 1
-        sleep(PERIOD_INTERVAL)
 
     master.shutdown()
     print("")
+    Notify.info(f"HTTP connection stats : {session_stats()}")
+    Notify.info(f"Iteration lateness stats : {scheduler.stats()}")
     Notify.info("Operation completed successfully")
 
 
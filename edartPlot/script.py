@@ -1,8 +1,34 @@
 import matplotlib.pyplot as plt
 from matplotlib import style
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+import argparse
 import os
-import json
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from library.ichimoku import cached_lines, TENKAN_PERIOD, KIJUN_PERIOD, SENKOU_B_PERIOD
+from library.sources import find_captures, read_capture
+from library.tickstore import TickStore
+
+##############################################################
+
+# size of rendered charts, in inches, and their resolution
+FIGURE_SIZE = (16, 9)
+DPI = 100
+# margins of rendered charts, as fractions of the figure
+MARGINS = {"left": 0.05, "right": 0.98, "bottom": 0.07, "top": 0.95}
+# format of rendered charts
+IMAGE_FORMAT = "png"
+# fast PNG compression, charts are mostly flat colour and stay small anyway
+PNG_COMPRESSION = 1
+# fixed legend position of rendered charts, searching for the best spot costs as much as drawing the chart
+LEGEND_LOCATION = "upper left"
+
+##############################################################
+
+# figure reused for every chart rendered by a worker of the batch mode
+figure = None
 
 
 class Ichimoku:
@@ -18,34 +44,40 @@ class Ichimoku:
         self.senkou_A_data = list()
 
     def from_file(self, filename):
-        path = ".\\database\\" + filename
-        with open(path, "r") as fp:
-            src = json.loads(fp.read())
-        self.ticker = src['ticker']
-        src = src['data']
-        self.data = [src[key] for key in src]
+        self.load(".\\database\\" + filename)
+
+    def load(self, path):
+        # tick files of the Miner are streamed, older captures are single JSON documents
+        capture = read_capture(path)
+        if capture is None:
+            raise ValueError(f"{path} is not a capture")
+        self.ticker = capture[0]
+        self.data = [price for _, price in capture[1]]
         self.len_data = len(self.data)
 
-    def prepare_data(self):
-        # tenkan
-        for i in range(self.len_data - 9):
-            tenkan_src = self.data[i:i + 9]
-            self.tenkan_data.append((max(tenkan_src) + min(tenkan_src)) / 2)
-
-        # kijun
-        for i in range(self.len_data - 26):
-            kijun_src = self.data[i:i + 26]
-            self.kijun_data.append((max(kijun_src) + min(kijun_src)) / 2)
+    def from_store(self, root, ticker, start=None, end=None):
+        # prices are memory-mapped from the tick store, nothing is parsed
+        times, prices = TickStore(root).load(ticker, start, end)
+        self.ticker = ticker
+        self.data = prices
+        self.len_data = len(self.data)
 
+    def prepare_data(self):
+        lines = cached_lines(self.data, self.ticker)
+        # each component is drawn one period after the window it is computed from
+        self.tenkan_data = lines.tenkan[TENKAN_PERIOD - 1:-1]
+        self.kijun_data = lines.kijun[KIJUN_PERIOD - 1:-1]
         self.chikou_data = self.data
-        self.senkou_A_data = [((self.tenkan_data[i+17] + self.kijun_data[i])/2) for i in range(self.len_data - 26)]
-
-        # senkou B
-        for i in range(self.len_data - 52):
-            senkou_B_src = self.data[i:i + 52]
-            self.senkou_B_data.append((max(senkou_B_src) + min(senkou_B_src))/2)
+        self.senkou_A_data = lines.senkou_A[KIJUN_PERIOD - 1:-1]
+        self.senkou_B_data = lines.senkou_B[SENKOU_B_PERIOD - 1:-1]
 
     def plot_data(self):
+        self.draw()
+        # filePath = ".\\plots\\" + self.ticker + ".png"
+        # plt.savefig(filePath, bbox_inches='tight')
+        plt.show()
+
+    def draw(self, legend="best"):
         # real time data
         x1 = np.array([i for i in range(1, self.len_data + 1)])
         y1 = np.array(self.data)
@@ -87,10 +119,7 @@ class Ichimoku:
         plt.xlabel('x - axis')
         plt.ylabel('y - axis')
         plt.title('ICHIMOKU - ' + self.ticker)
-        plt.legend()
-        # filePath = ".\\plots\\" + self.ticker + ".png"
-        # plt.savefig(filePath, bbox_inches='tight')
-        plt.show()
+        plt.legend(loc=legend)
 
 
 def plot(file_):
@@ -101,8 +130,87 @@ def plot(file_):
     plt.clf()
 
 
+def start_worker():
+    global figure
+    # charts are only written to files, the non-interactive backend skips the GUI entirely
+    plt.switch_backend("Agg")
+    figure = plt.figure(figsize=FIGURE_SIZE, dpi=DPI)
+
+
+def render(source, target):
+    """
+        Render the chart of a capture to an image file, on the figure of the worker
+    Returns:
+        target if the chart was rendered, None if the capture is too short to chart
+
+    """
+    ichPlot = Ichimoku()
+    ichPlot.load(source)
+    if ichPlot.len_data <= SENKOU_B_PERIOD:
+        return None
+    ichPlot.prepare_data()
+    figure.clf()
+    # fixed margins, fitting a tight bounding box draws every chart twice
+    figure.subplots_adjust(**MARGINS)
+    plt.figure(figure.number)
+    ichPlot.draw(LEGEND_LOCATION)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    figure.savefig(target, pil_kwargs={"compress_level": PNG_COMPRESSION})
+    return target
+
+
+def render_all(root, output, workers=None, force=False):
+    """
+        Render the chart of every capture under root, into the same tree of directories under output, spread over a
+        pool of processes. Charts newer than their capture are skipped unless forced
+    Args:
+        root: directory of captures
+        output: directory of the charts
+        workers: number of processes, defaults to the number of CPUs
+        force: render charts even if they are up to date
+
+    Returns:
+        number of charts rendered and number of charts skipped
+
+    """
+    jobs = list()
+    skipped = 0
+    for source in find_captures([root]):
+        target = os.path.join(output, os.path.splitext(os.path.relpath(source, root))[0] + "." + IMAGE_FORMAT)
+        if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+            skipped += 1
+            continue
+        jobs.append((source, target))
+    if not jobs:
+        return 0, skipped
+    with ProcessPoolExecutor(max_workers=workers, initializer=start_worker) as executor:
+        futures = [executor.submit(render, source, target) for source, target in jobs]
+        rendered = 0
+        for future in futures:
+            try:
+                if future.result() is not None:
+                    rendered += 1
+            except ValueError:
+                # JSON files which are not captures, such as user_info.json
+                pass
+    return rendered, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="script.py", description="Plot Ichimoku charts of captured prices")
+    parser.add_argument("file", nargs="?", default="GOODYEAR.BO.json", help="Capture in the database to show")
+    parser.add_argument("--batch", metavar="ROOT", help="Render the chart of every capture under ROOT to files")
+    parser.add_argument("--output", default="plots", help="Directory of the charts rendered in batch mode")
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes rendering charts")
+    parser.add_argument("--force", action="store_true", help="Render charts even if they are up to date")
+    args = parser.parse_args()
+
+    if args.batch is None:
+        plot(args.file)
+        return
+    rendered, skipped = render_all(args.batch, args.output, args.workers, args.force)
+    print(f"Rendered {rendered} charts, skipped {skipped} up to date")
+
+
 if __name__ == "__main__":
-    # for _, _, files in os.walk("database"):
-    #     for file in files:
-    #         plot(file)
-    plot("GOODYEAR.BO.json")
\ No newline at end of file
+    main()
@@ -0,0 +1,85 @@
+import os
+import threading
+from time import time
+
+##############################################################
+
+# directory of the cached frames, in the database of the repository
+HISTORY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "history")
+# a cached frame younger than this is served without asking for newer bars, in seconds
+HISTORY_TTL = 15 * 60
+
+##############################################################
+
+
+class HistoryCache:
+    """
+        On-disk cache of OHLCV frames, one file per ticker and interval. Bars before the last cached one are final,
+        the last one may still be forming, so it is fetched again along with the newer bars once the frame is older
+        than the TTL
+
+    Args:
+        directory: directory of the cached frames, created when the first frame is saved
+        ttl: age below which a cached frame is served as is, in seconds
+        offline: serve cached frames whatever their age and never fetch
+    """
+
+    def __init__(self, directory=HISTORY_DIR, ttl=HISTORY_TTL, offline=False):
+        self.directory = directory
+        self.ttl = ttl
+        self.offline = offline
+        self.lock = threading.Lock()
+
+    def path(self, ticker, interval):
+        return os.path.join(self.directory, f"{ticker.upper()}.{interval}.pkl")
+
+    def load(self, ticker, interval):
+        """
+            Cached frame of a ticker
+        Returns:
+            frame and its age in seconds, or None and None if nothing is cached
+
+        """
+        # pandas is heavy to import and only needed once history is requested
+        import pandas as pd
+
+        path = self.path(ticker, interval)
+        with self.lock:
+            if not os.path.exists(path):
+                return None, None
+            return pd.read_pickle(path), time() - os.path.getmtime(path)
+
+    def save(self, ticker, interval, frame):
+        path = self.path(ticker, interval)
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            # written aside and moved in place, so readers never see half a frame
+            frame.to_pickle(path + ".tmp")
+            os.replace(path + ".tmp", path)
+
+    def merge(self, frame, fetched):
+        """
+            Replace the bars of a cached frame from the first fetched bar onwards with the fetched bars
+        """
+        import pandas as pd
+
+        if frame is None:
+            return fetched
+        if fetched.empty:
+            return frame
+        return pd.concat([frame[frame.index < fetched.index[0]], fetched])
+
+
+history = HistoryCache()
+
+
+def configure_history(**kwargs):
+    """
+        Replace the history cache, accepts the arguments of HistoryCache
+    """
+    global history
+    history = HistoryCache(**kwargs)
+
+
+def get_history():
+    return history
@@ -0,0 +1,277 @@
+import hashlib
+import threading
+from collections import OrderedDict, deque, namedtuple
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+##############################################################
+
+# look-back period of the conversion line
+TENKAN_PERIOD = 9
+# look-back period of the base line
+KIJUN_PERIOD = 26
+# look-back period of leading span B
+SENKOU_B_PERIOD = 52
+# number of periods the leading spans are projected ahead
+DISPLACEMENT = 26
+
+##############################################################
+
+# most indicator series kept by the cache
+CACHE_ENTRIES = 256
+# most memory taken by the arrays kept by the cache, in bytes
+CACHE_BYTES = 64 * 1024 * 1024
+
+##############################################################
+
+Lines = namedtuple("Lines", ["price", "tenkan", "kijun", "senkou_A", "senkou_B"])
+Series = namedtuple("Series", ["tenkan", "kijun", "senkou_A", "senkou_B", "chikou"])
+
+
+def rolling_mid(prices, period):
+    """
+        Mid point of the highest and lowest price over a sliding window, along the last axis
+    Args:
+        prices: array of prices, time along the last axis
+        period: size of the sliding window
+
+    Returns:
+        float array shaped like prices, NaN until the first window has filled up
+
+    """
+    prices = np.ascontiguousarray(prices, dtype=float)
+    mid = np.full(prices.shape, np.nan)
+    length = prices.shape[-1]
+    if length >= period:
+        shape = prices.shape[:-1] + (length - period + 1, period)
+        windows = as_strided(prices, shape=shape, strides=prices.strides + prices.strides[-1:], writeable=False)
+        mid[..., period - 1:] = (windows.max(axis=-1) + windows.min(axis=-1)) / 2
+    return mid
+
+
+def latest_mid(prices, end, period):
+    """
+        Mid point of the highest and lowest price over the single window of period prices ending before index end, along
+        the last axis, the value rolling_mid gives at index end - 1 without computing the other windows
+    """
+    window = prices[..., end - period:end]
+    return (window.max(axis=-1) + window.min(axis=-1)) / 2
+
+
+def ichimoku_lines(prices, tenkan=TENKAN_PERIOD, kijun=KIJUN_PERIOD, senkou_B=SENKOU_B_PERIOD):
+    """
+        Vectorised Ichimoku kernel, computes all five lines for every ticker in one call
+    Args:
+        prices: 1-D array of prices or 2-D array of shape (tickers, time)
+        tenkan: look-back period of the conversion line
+        kijun: look-back period of the base line
+        senkou_B: look-back period of leading span B
+
+    Returns:
+        Series tuple of arrays shaped like prices. Every entry belongs to the period it is computed from, so the
+        leading spans are to be drawn DISPLACEMENT periods ahead and the chikou span DISPLACEMENT periods behind
+
+    """
+    prices = np.asarray(prices, dtype=float)
+    tenkan_line = rolling_mid(prices, tenkan)
+    kijun_line = rolling_mid(prices, kijun)
+    return Series(tenkan_line, kijun_line, (tenkan_line + kijun_line) / 2, rolling_mid(prices, senkou_B), prices)
+
+
+def fingerprint(prices):
+    """
+        Digest of the shape and values of a price series, equal series give equal digests
+    """
+    prices = np.ascontiguousarray(prices, dtype=float)
+    digest = hashlib.blake2b(prices.tobytes(), digest_size=16)
+    digest.update(repr(prices.shape).encode())
+    return digest.hexdigest()
+
+
+class IndicatorCache:
+    """
+        Least recently used cache of computed indicator series, evicting the oldest entries once it holds more than
+        a number of entries or more than a number of bytes of arrays. Cached arrays are read-only, as they are shared
+        by every caller
+
+    Args:
+        entries: most entries kept
+        size: most bytes of arrays kept
+    """
+
+    def __init__(self, entries=CACHE_ENTRIES, size=CACHE_BYTES):
+        self.entries = entries
+        self.size = size
+        self.store = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.store:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.store.move_to_end(key)
+            return self.store[key][0]
+
+    def put(self, key, value):
+        for array in value:
+            array.flags.writeable = False
+        nbytes = sum(array.nbytes for array in value)
+        with self.lock:
+            if key in self.store:
+                self.bytes -= self.store.pop(key)[1]
+            # a series larger than the whole cache is not kept
+            if nbytes > self.size:
+                return
+            self.store[key] = (value, nbytes)
+            self.bytes += nbytes
+            while len(self.store) > self.entries or self.bytes > self.size:
+                self.bytes -= self.store.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self.lock:
+            self.store.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.store), "bytes": self.bytes, "hits": self.hits, "misses": self.misses}
+
+
+cache = IndicatorCache()
+
+
+def cached_lines(prices, ticker=None, tenkan=TENKAN_PERIOD, kijun=KIJUN_PERIOD, senkou_B=SENKOU_B_PERIOD):
+    """
+        ichimoku_lines memoized on the ticker, the periods and a fingerprint of the prices, repeated requests for the
+        same series return the arrays computed the first time
+    Args:
+        prices: 1-D array of prices or 2-D array of shape (tickers, time)
+        ticker: ticker or other label of the series
+        tenkan: look-back period of the conversion line
+        kijun: look-back period of the base line
+        senkou_B: look-back period of leading span B
+
+    Returns:
+        Series tuple of read-only arrays, as returned by ichimoku_lines
+
+    """
+    prices = np.array(prices, dtype=float)
+    key = (ticker, (tenkan, kijun, senkou_B), fingerprint(prices))
+    lines = cache.get(key)
+    if lines is None:
+        lines = ichimoku_lines(prices, tenkan, kijun, senkou_B)
+        cache.put(key, lines)
+    return lines
+
+
+def cache_stats():
+    return cache.stats()
+
+
+class RollingExtrema:
+    """
+        Maximum and minimum of a sliding window, kept in monotonic deques so that each push costs amortised O(1)
+        irrespective of the window size
+    """
+
+    __slots__ = ("size", "count", "maxima", "minima")
+
+    def __init__(self, size):
+        self.size = size
+        self.count = 0
+        # (index, value) pairs, values decreasing from left to right
+        self.maxima = deque()
+        # (index, value) pairs, values increasing from left to right
+        self.minima = deque()
+
+    def push(self, value):
+        index = self.count
+        while self.maxima and self.maxima[-1][1] <= value:
+            self.maxima.pop()
+        self.maxima.append((index, value))
+        while self.minima and self.minima[-1][1] >= value:
+            self.minima.pop()
+        self.minima.append((index, value))
+        # evict entries which have slid out of the window
+        expired = index - self.size
+        if self.maxima[0][0] <= expired:
+            self.maxima.popleft()
+        if self.minima[0][0] <= expired:
+            self.minima.popleft()
+        self.count += 1
+
+    @property
+    def ready(self):
+        return self.count >= self.size
+
+    def mid(self):
+        """
+            Mid point of the highest and lowest value in the window, None until the window has filled up
+        """
+        if not self.ready:
+            return None
+        return (self.maxima[0][1] + self.minima[0][1]) / 2
+
+
+class IchimokuStream:
+    """
+        Streaming Ichimoku engine, updates every component incrementally as each price arrives
+
+    Args:
+        tenkan: look-back period of the conversion line
+        kijun: look-back period of the base line
+        senkou_B: look-back period of leading span B
+        displacement: number of periods the leading spans are projected ahead
+        depth: number of past periods that can be looked up through lag
+    """
+
+    __slots__ = ("displacement", "tenkan_window", "kijun_window", "senkou_B_window", "history")
+
+    def __init__(self, tenkan=TENKAN_PERIOD, kijun=KIJUN_PERIOD, senkou_B=SENKOU_B_PERIOD,
+                 displacement=DISPLACEMENT, depth=2):
+        self.displacement = displacement
+        self.tenkan_window = RollingExtrema(tenkan)
+        self.kijun_window = RollingExtrema(kijun)
+        self.senkou_B_window = RollingExtrema(senkou_B)
+        # (price, tenkan, kijun, senkou B mid point) of the most recent periods
+        self.history = deque(maxlen=displacement + depth)
+
+    def push(self, price):
+        self.tenkan_window.push(price)
+        self.kijun_window.push(price)
+        self.senkou_B_window.push(price)
+        self.history.append((price, self.tenkan_window.mid(), self.kijun_window.mid(), self.senkou_B_window.mid()))
+
+    def __len__(self):
+        return self.tenkan_window.count
+
+    def ready(self, lag=0):
+        """
+            Check if all components are available for the period lag steps behind the latest price
+        """
+        if lag + self.displacement >= len(self.history):
+            return False
+        _, tenkan, kijun, senkou_B = self.history[-1 - lag - self.displacement]
+        return None not in (tenkan, kijun, senkou_B)
+
+    def snapshot(self, lag=0):
+        """
+            Ichimoku components of the period lag steps behind the latest price
+        Args:
+            lag: number of periods to look back, must be smaller than depth
+
+        Returns:
+            Lines tuple of price, tenkan, kijun, senkou A and senkou B
+
+        """
+        if not self.ready(lag):
+            raise ValueError(f"Not enough data to compute Ichimoku components with lag {lag}")
+        price, tenkan, kijun, _ = self.history[-1 - lag]
+        _, past_tenkan, past_kijun, past_senkou_B = self.history[-1 - lag - self.displacement]
+        return Lines(price, tenkan, kijun, (past_tenkan + past_kijun) / 2, past_senkou_B)
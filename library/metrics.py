@@ -0,0 +1,214 @@
+import os
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+
+##############################################################
+
+# upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# address the metrics are served on, only reachable from the machine itself
+METRICS_HOST = "127.0.0.1"
+# file the metrics are written to at shutdown, in the directory of the day
+METRICS_FILE = "metrics.prom"
+# content type of the Prometheus text format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+##############################################################
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def labels(pairs):
+    pairs = [(key, value) for key, value in pairs if key is not None]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in pairs) + "}"
+
+
+class Counter:
+    """
+        Monotonic count, optionally split by the value of one label
+
+    Args:
+        name: name of the metric
+        description: help text of the metric
+        label: name of the label splitting the count, None for a single count
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, description, label=None):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.series = dict()
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, label=None):
+        with self.lock:
+            self.series[label] = self.series.get(label, 0) + amount
+
+    def value(self, label=None):
+        return self.series.get(label, 0)
+
+    def samples(self):
+        with self.lock:
+            series = sorted(self.series.items(), key=lambda item: str(item[0]))
+        return [f"{self.name}{labels([(self.label, label)])} {count}" for label, count in series]
+
+
+class Histogram:
+    """
+        Distribution of observed values over cumulative buckets, optionally split by the value of one label
+
+    Args:
+        name: name of the metric
+        description: help text of the metric
+        buckets: increasing upper bounds of the buckets, an unbounded bucket is always added
+        label: name of the label splitting the distribution, None for a single distribution
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, description, buckets=LATENCY_BUCKETS, label=None):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.label = label
+        # count per bucket, the unbounded one last, and sum of the observations of every label value
+        self.series = dict()
+        self.lock = threading.Lock()
+
+    def observe(self, value, label=None):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label)
+            if series is None:
+                series = self.series[label] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, label=None):
+        """
+            Observe the time spent in a with block, in seconds
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, label)
+
+    def count(self, label=None):
+        series = self.series.get(label)
+        return sum(series[0]) if series is not None else 0
+
+    def samples(self):
+        with self.lock:
+            series = sorted(((label, list(counts), total) for label, (counts, total) in self.series.items()),
+                            key=lambda item: str(item[0]))
+        lines = list()
+        for label, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{labels([(self.label, label), ('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{labels([(self.label, label)])} {total}")
+            lines.append(f"{self.name}_count{labels([(self.label, label)])} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+        Set of metrics rendered together in the Prometheus text format
+    """
+
+    def __init__(self):
+        self.metrics = dict()
+        self.server = None
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, description, label=None):
+        return self.register(Counter(name, description, label))
+
+    def histogram(self, name, description, buckets=LATENCY_BUCKETS, label=None):
+        return self.register(Histogram(name, description, buckets, label))
+
+    def render(self):
+        lines = list()
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path=METRICS_FILE):
+        # written aside and moved in place, so a collector never reads half the metrics
+        with open(path + ".tmp", "w") as fp:
+            fp.write(self.render())
+        os.replace(path + ".tmp", path)
+
+    def serve(self, port, host=METRICS_HOST):
+        """
+            Serve the metrics over HTTP from a background thread, port 0 picks a free port
+        Returns:
+            port the metrics are served on
+
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            # scrapes are not worth a line on the terminal each
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True).start()
+        return self.server.server_address[1]
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+registry = Registry()
+
+# stages of a round, in seconds
+fetch_latency = registry.histogram("edartpy_fetch_seconds", "Latency of price requests, per ticker", label="ticker")
+decision_time = registry.histogram("edartpy_decision_seconds", "Time spent deciding, per trader or per book step",
+                                   label="engine")
+persist_time = registry.histogram("edartpy_persist_seconds", "Time spent logging and saving trades and databases",
+                                  label="stage")
+round_time = registry.histogram("edartpy_round_seconds", "Duration of trading rounds")
+round_lateness = registry.histogram("edartpy_round_lateness_seconds", "Delay of rounds past their deadline")
+# events
+retries = registry.counter("edartpy_retries_total", "Price requests retried after a failure", label="stage")
+orders = registry.counter("edartpy_orders_total", "Orders emitted by the traders", label="action")
+
+
+def get_metrics():
+    return registry
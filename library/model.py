@@ -1,3 +1,5 @@
+import numpy as np
+
 ##############################################################
 
 # Weight for a strong bullish signal
@@ -151,3 +153,83 @@ class Model:
 	def get_conf(self):
 		conf = (self.tk_cross() + self.kijun_cross() + self.chikou_break() + self.kumo_twist()) / 4
 		return conf
+
+
+def state(a, b):
+	"""
+		Element-wise -1, 1 or 0 as a is below, above or neither of b, the same as the branches of Model
+	"""
+	return np.asarray(a > b, dtype=int) - np.asarray(a < b, dtype=int)
+
+
+class BatchModel:
+	"""
+		Array native Model, scores whole series of snapshots at once, element i gives the same confidence as Model
+		built from the i-th element of every argument. The old states of a series are its new states shifted by one
+
+	Args:
+		price, tenkan, kijun, sen_A, sen_B, price_26: arrays of the snapshots
+		tk_old, pk_old, cp_old, ab_old: arrays of the states at the previous snapshots
+		fut_senA, fut_senB: arrays of the leading spans projected into the future
+	"""
+
+	def __init__(self, price, tenkan, kijun, sen_A, sen_B, price_26, tk_old, pk_old, cp_old, ab_old, fut_senA, fut_senB):
+		self.price = np.asarray(price, dtype=float)
+		self.tenkan = np.asarray(tenkan, dtype=float)
+		self.kijun = np.asarray(kijun, dtype=float)
+		self.sen_A = np.asarray(sen_A, dtype=float)
+		self.sen_B = np.asarray(sen_B, dtype=float)
+		self.price_26 = np.asarray(price_26, dtype=float)
+
+		self.tk_old = np.asarray(tk_old)
+		self.pk_old = np.asarray(pk_old)
+		self.cp_old = np.asarray(cp_old)
+		self.ab_old = np.asarray(ab_old)
+
+		self.fa = np.asarray(fut_senA, dtype=float)
+		self.fb = np.asarray(fut_senB, dtype=float)
+
+		self.tk_new = state(self.tenkan, self.kijun)
+		self.pk_new = state(self.price, self.kijun)
+		self.cp_new = state(self.price, self.price_26)
+		self.ab_new = state(self.fa, self.fb)
+
+		# same picks as the built-in max and min, which keep the first argument when the comparison fails
+		self.k_upper = np.where(self.sen_B > self.sen_A, self.sen_B, self.sen_A)
+		self.k_lower = np.where(self.sen_B < self.sen_A, self.sen_B, self.sen_A)
+
+	def tk_cross(self):
+		bull = (self.tk_new == 1) & (self.tk_old == -1)
+		bear = (self.tk_new == -1) & (self.tk_old == 1)
+		return np.select(
+			[bull & (self.kijun > self.k_upper), bull & (self.tenkan < self.k_lower), bull,
+			 bear & (self.tenkan > self.k_upper), bear & (self.kijun < self.k_lower), bear],
+			[STRONG_BULL, WEAK_BULL, NEUTRAL_BULL, WEAK_BEAR, STRONG_BEAR, NEUTRAL_BEAR], DEFAULT)
+
+	def kijun_cross(self):
+		bull = (self.pk_new == 1) & (self.pk_old == -1)
+		bear = (self.pk_new == -1) & (self.pk_old == 1)
+		return np.select(
+			[bull & (self.kijun > self.k_upper), bull & (self.price < self.k_lower), bull,
+			 bear & (self.price > self.k_upper), bear & (self.kijun < self.k_lower), bear],
+			[STRONG_BULL, WEAK_BULL, NEUTRAL_BULL, WEAK_BEAR, STRONG_BEAR, NEUTRAL_BEAR], DEFAULT)
+
+	def chikou_break(self):
+		bull = (self.cp_new == 1) & (self.cp_old == -1)
+		bear = (self.cp_new == -1) & (self.cp_old == 1)
+		return np.select(
+			[bull & (self.price > self.k_upper), bull & (self.price < self.k_lower), bull,
+			 bear & (self.price < self.k_lower), bear & (self.price > self.k_upper), bear],
+			[STRONG_BULL, WEAK_BULL, NEUTRAL_BULL, STRONG_BEAR, WEAK_BEAR, NEUTRAL_BEAR], DEFAULT)
+
+	def kumo_twist(self):
+		bull = (self.ab_old == -1) & (self.ab_new == 1)
+		bear = (self.ab_old == 1) & (self.ab_new == -1)
+		return np.select(
+			[bull & (self.price > self.k_upper), bull & (self.price < self.k_lower), bull,
+			 bear & (self.price < self.k_lower), bear & (self.price > self.k_upper), bear],
+			[STRONG_BULL, WEAK_BULL, NEUTRAL_BULL, STRONG_BEAR, WEAK_BEAR, NEUTRAL_BEAR], DEFAULT)
+
+	def get_conf(self):
+		conf = (self.tk_cross() + self.kijun_cross() + self.chikou_break() + self.kumo_twist()) / 4
+		return conf
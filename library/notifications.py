@@ -1,43 +1,159 @@
+import atexit
+import sys
+import threading
+from queue import Full, Queue
+from time import monotonic, sleep
+
 from colorama import Fore, Style
-from time import sleep
 
 
 PAUSE = 0.02
+# number of messages waiting to be rendered, messages beyond it are dropped
+QUEUE_SIZE = 256
+# a message repeated within this window is counted instead of rendered again, in seconds
+COALESCE_WINDOW = 5.0
+# longest wait for pending messages at exit, in seconds
+EXIT_TIMEOUT = 5.0
+
+
+class Console:
+    """
+        Renders console output on a background thread from a bounded queue, so callers never wait on the terminal
+
+    Args:
+        instant: render whole messages at once instead of one character at a time
+        size: number of messages waiting to be rendered, messages beyond it are dropped
+        window: a message repeated within this window is counted instead of rendered again, in seconds
+    """
+
+    def __init__(self, instant=False, size=QUEUE_SIZE, window=COALESCE_WINDOW):
+        self.instant = instant
+        self.window = window
+        self.queue = Queue(maxsize=size)
+        self.lock = threading.Lock()
+        self.thread = None
+        # (prefix, message, time) of the last notification and the number of times it has been repeated since
+        self.last = None
+        self.repeats = 0
+        self.dropped = 0
+
+    def notify(self, prefix, message, delay):
+        """
+            Queue a notification, repeats of the previous notification within the window are coalesced
+        """
+        now = monotonic()
+        with self.lock:
+            if self.last is not None and self.last[:2] == (prefix, message) and now - self.last[2] < self.window:
+                self.repeats += 1
+                return
+            self.put_repeats()
+            self.last = (prefix, message, now)
+            self.put((prefix, message, "\n", delay))
+
+    def write(self, text, end="\n", delay=0):
+        """
+            Queue raw text, rendered in order with the notifications
+        """
+        with self.lock:
+            self.put_repeats()
+            self.last = None
+            self.put(("", text, end, delay))
+
+    def put_repeats(self):
+        if self.repeats:
+            self.put((self.last[0], f"(last message repeated {self.repeats} more times)", "\n", 0))
+            self.repeats = 0
+
+    def put(self, item):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.render, name="console", daemon=True)
+            self.thread.start()
+        try:
+            self.queue.put_nowait(item)
+        except Full:
+            self.dropped += 1
+
+    def render(self):
+        while True:
+            prefix, message, end, delay = self.queue.get()
+            try:
+                # producers count drops under the lock, so none is lost between reading and resetting the count
+                with self.lock:
+                    dropped, self.dropped = self.dropped, 0
+                if dropped:
+                    sys.stdout.write(Fore.CYAN + "[ WARNING ]  " + Style.RESET_ALL +
+                                     f"Console overloaded, dropped {dropped} messages\n")
+                sys.stdout.write(prefix)
+                if self.instant or not delay:
+                    sys.stdout.write(message)
+                else:
+                    for char in message:
+                        sys.stdout.write(char)
+                        sys.stdout.flush()
+                        sleep(delay)
+                sys.stdout.write(end)
+                sys.stdout.flush()
+            finally:
+                self.queue.task_done()
+
+    def flush(self, timeout=None):
+        """
+            Wait until every queued message has been rendered, or until timeout seconds have passed
+        """
+        with self.lock:
+            self.put_repeats()
+        if self.thread is None:
+            return
+        if timeout is None:
+            self.queue.join()
+            return
+        deadline = monotonic() + timeout
+        while self.queue.unfinished_tasks and monotonic() < deadline:
+            sleep(0.01)
+
+
+console = Console()
+atexit.register(lambda: console.flush(EXIT_TIMEOUT))
 
 
 class Notify:
+    @staticmethod
+    def configure(instant=False, size=QUEUE_SIZE, window=COALESCE_WINDOW) -> None:
+        """
+            Replace the console renderer, instant mode renders whole messages at once for production use
+        """
+        global console
+        console.flush()
+        console = Console(instant, size, window)
+
+    @staticmethod
+    def flush() -> None:
+        console.flush()
+
+    @staticmethod
+    def write(text: str = "", end: str = "\n") -> None:
+        console.write(text, end)
+
     @staticmethod
     def heading(heading: str) -> None:
-        print(Fore.YELLOW + heading)
-        print(Style.RESET_ALL)
+        console.write(Fore.YELLOW + heading)
+        console.write(Style.RESET_ALL)
 
     @staticmethod
     def for_input(message: str, delay: float = PAUSE) -> None:
-        print(Fore.GREEN + "[ MESSAGE ]  " + Style.RESET_ALL, end="")
-        for char in message:
-            print(char, end="")
-            sleep(delay)
+        console.write(Fore.GREEN + "[ MESSAGE ]  " + Style.RESET_ALL, end="")
+        console.write(message, end="", delay=delay)
+        # the prompt has to be on screen before input is read
+        console.flush()
 
     @staticmethod
     def info(message: str, delay: float = PAUSE) -> None:
-        print(Fore.GREEN + "[ MESSAGE ]  " + Style.RESET_ALL, end="")
-        for char in message:
-            print(char, end="")
-            sleep(delay)
-        print("")
+        console.notify(Fore.GREEN + "[ MESSAGE ]  " + Style.RESET_ALL, message, delay)
 
     @staticmethod
     def warn(message: str, delay: float = PAUSE) -> None:
-        print(Fore.CYAN + "[ WARNING ]  " + Style.RESET_ALL, end="")
-        for char in message:
-            print(char, end="")
-            sleep(delay)
-        print("")
+        console.notify(Fore.CYAN + "[ WARNING ]  " + Style.RESET_ALL, message, delay)
 
     @staticmethod
     def fatal(message: str, delay: float = PAUSE) -> None:
-        print(Fore.RED + "[  FATAL  ]  " + Style.RESET_ALL, end="")
-        for char in message:
-            print(char, end="")
-            sleep(delay)
-        print("")
+        console.notify(Fore.RED + "[  FATAL  ]  " + Style.RESET_ALL, message, delay)
@@ -0,0 +1,167 @@
+import cProfile
+import io
+import os
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+
+##############################################################
+
+# number of functions listed in the hot spot reports
+TOP_FUNCTIONS = 40
+# number of source lines listed in the allocation reports
+TOP_ALLOCATIONS = 25
+# frames kept for every traced allocation
+TRACE_FRAMES = 1
+
+##############################################################
+
+
+class Profiler:
+    """
+        CPU and allocation profiler of the phases of a session. A phase is profiled as a whole, or only over its sampled
+        rounds, one round every so many. Allocations are traced over the same span as CPU time, so rounds left out of
+        the sample run without the cost of tracing. Reports are written when a phase ends, however it ends, so an
+        aborted session still leaves them behind. Only the thread driving the session is profiled, time spent waiting
+        on the fetch pool shows up as waits
+
+    Args:
+        enabled: profile at all, a disabled profiler costs next to nothing
+        every: profile one round out of every this many
+        directory: directory the reports are written to, None for the working directory at the end of the phase
+        top: number of functions listed in the hot spot reports
+        allocations: number of source lines listed in the allocation reports
+    """
+
+    def __init__(self, enabled=True, every=1, directory=None, top=TOP_FUNCTIONS, allocations=TOP_ALLOCATIONS):
+        if every < 1:
+            raise ValueError("Rounds must be sampled one out of a positive number")
+        self.enabled = enabled
+        self.every = every
+        self.directory = directory
+        self.top = top
+        self.allocations = allocations
+        # CPU profile of the current phase, enabled over the whole phase unless it samples rounds
+        self.profile = None
+        self.sampling = False
+        self.sampled = 0
+        # growth of the memory held per source line, summed over the traced spans of the phase, and the snapshot at
+        # the end of the last span
+        self.growth = dict()
+        self.held = None
+
+    @contextmanager
+    def phase(self, name, sample=False):
+        """
+            Profile a phase of the session and write its reports once it ends
+        Args:
+            name: name of the phase, reports are named after it
+            sample: profile only the rounds run within the phase, through round
+
+        """
+        if not self.enabled:
+            yield
+            return
+        self.profile = cProfile.Profile()
+        self.sampling = sample
+        self.sampled = 0
+        self.growth = dict()
+        self.held = None
+        try:
+            if sample:
+                yield
+            else:
+                with self.trace():
+                    yield
+        finally:
+            self.write(name)
+            self.profile = None
+
+    @contextmanager
+    def round(self, count):
+        """
+            Profile a round of a sampling phase if it is one of the sampled rounds
+        """
+        if self.profile is None or not self.sampling or count % self.every:
+            yield
+            return
+        self.sampled += 1
+        with self.trace():
+            yield
+
+    @contextmanager
+    def trace(self):
+        """
+            Profile CPU time and trace allocations over a with block, adding its allocations to those of the phase
+        """
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start(TRACE_FRAMES)
+        start = tracemalloc.take_snapshot()
+        self.profile.enable()
+        try:
+            yield
+        finally:
+            self.profile.disable()
+            end = tracemalloc.take_snapshot()
+            if not tracing:
+                tracemalloc.stop()
+            self.collect(start, end)
+
+    def collect(self, start, end):
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        start, end = start.filter_traces(filters), end.filter_traces(filters)
+        self.held = end
+        for stat in end.compare_to(start, "lineno"):
+            size, size_diff, count, count_diff = self.growth.get(stat.traceback, (0, 0, 0, 0))
+            self.growth[stat.traceback] = (size + stat.size, size_diff + stat.size_diff, count + stat.count,
+                                           count_diff + stat.count_diff)
+
+    def write(self, name):
+        directory = self.directory if self.directory is not None else os.getcwd()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"profile-{name}")
+
+        report = io.StringIO()
+        if self.sampling:
+            report.write(f"Sampled {self.sampled} rounds, one out of every {self.every}\n\n")
+        if self.profile.getstats():
+            # the raw statistics can be explored further with pstats or any of its viewers
+            self.profile.dump_stats(path + ".pstats")
+            for key in ("tottime", "cumulative"):
+                report.write(f"Top {self.top} functions by {key}\n")
+                pstats.Stats(self.profile, stream=report).sort_stats(key).print_stats(self.top)
+        else:
+            report.write("No calls profiled\n")
+        with open(path + ".txt", "w") as fp:
+            fp.write(report.getvalue())
+
+        with open(path + ".allocations.txt", "w") as fp:
+            if self.held is None:
+                fp.write("No allocations traced\n")
+                return
+            span = "the last sampled round" if self.sampling else "the phase"
+            fp.write(f"Top {self.allocations} lines by memory held at the end of {span}\n")
+            for stat in self.held.statistics("lineno")[:self.allocations]:
+                fp.write(f"{stat}\n")
+            span = "the sampled rounds" if self.sampling else "the phase"
+            fp.write(f"\nTop {self.allocations} lines by growth of the memory held over {span}\n")
+            growth = [tracemalloc.StatisticDiff(traceback, *sizes) for traceback, sizes in self.growth.items()]
+            growth.sort(key=lambda stat: (abs(stat.size_diff), stat.size), reverse=True)
+            for stat in growth[:self.allocations]:
+                fp.write(f"{stat}\n")
+
+
+profiler = Profiler(enabled=False)
+
+
+def configure_profiler(**kwargs):
+    """
+        Replace the profiler, accepts the arguments of Profiler
+    """
+    global profiler
+    profiler = Profiler(**kwargs)
+
+
+def get_profiler():
+    return profiler
@@ -0,0 +1,66 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+        Fixed capacity buffer of numbers, preallocated in a NumPy array. Every value is stored twice, capacity apart,
+        so the buffered values are always one contiguous slice and can be handed out as a view without copying
+
+    Args:
+        capacity: number of values kept, the oldest value is evicted when a value is appended to a full buffer
+        dtype: NumPy type of the values
+    """
+
+    __slots__ = ("capacity", "data", "start", "length")
+
+    def __init__(self, capacity, dtype=float):
+        self.capacity = capacity
+        self.data = np.zeros(2 * capacity, dtype=dtype)
+        # position of the oldest value and number of values buffered
+        self.start = 0
+        self.length = 0
+
+    def append(self, value):
+        if self.length == self.capacity:
+            self.popleft()
+        slot = (self.start + self.length) % self.capacity
+        self.data[slot] = value
+        self.data[slot + self.capacity] = value
+        self.length += 1
+
+    def popleft(self):
+        if not self.length:
+            raise IndexError("pop from an empty RingBuffer")
+        value = self.data[self.start].item()
+        self.start = (self.start + 1) % self.capacity
+        self.length -= 1
+        return value
+
+    def view(self):
+        """
+            Read-only view of the buffered values, oldest first, valid until the next append
+        """
+        view = self.data[self.start:self.start + self.length]
+        view.flags.writeable = False
+        return view
+
+    def __array__(self, dtype=None, copy=None):
+        return self.view() if dtype is None else self.view().astype(dtype)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.view()[index]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("RingBuffer index out of range")
+        return self.data[self.start + index].item()
+
+    def __iter__(self):
+        return iter(self.view().tolist())
+
+    def __repr__(self):
+        return f"RingBuffer({self.view().tolist()}, capacity={self.capacity})"
@@ -0,0 +1,118 @@
+import math
+from time import sleep, time
+
+##############################################################
+
+# missed deadlines are dropped, the next round fires at the next deadline still ahead or within the tolerance
+SKIP = "skip"
+# a round this late past its deadline, as a fraction of the period, still fires instead of being skipped
+TOLERANCE = 0.1
+# missed deadlines fire back to back until the schedule has caught up
+COMPRESS = "compress"
+# most missed rounds run back to back when compressing, older ones are skipped
+BACKLOG = 3
+# longest sleep between two calls of the idle callback while waiting, in seconds
+IDLE_STEP = 1.0
+
+##############################################################
+
+
+class Scheduler:
+    """
+        Fires rounds on absolute wall clock deadlines, one period apart, so the cadence does not drift with the time
+        spent in each round. Deadlines are aligned to multiples of the period, a period of 60 fires on minute
+        boundaries. Rounds can be staggered, spreading the work of a round over a fraction of the period
+
+    Args:
+        period: time between deadlines, in seconds, rounds fire immediately when it is zero
+        overrun: SKIP or COMPRESS, what to do with deadlines missed by an overrunning round
+        stagger: fraction of the period the work of a round is spread over
+        align: align deadlines to multiples of the period, otherwise the first deadline is now
+        backlog: most missed rounds fired back to back when compressing
+        tolerance: fraction of the period a round may be late by and still fire, later deadlines count as missed
+    """
+
+    def __init__(self, period, overrun=SKIP, stagger=0.0, align=True, backlog=BACKLOG, tolerance=TOLERANCE):
+        if overrun not in (SKIP, COMPRESS):
+            raise ValueError(f"Unknown overrun policy '{overrun}', expected {SKIP} or {COMPRESS}")
+        if not 0 <= stagger < 1:
+            raise ValueError("Stagger must be a fraction of the period, at least 0 and below 1")
+        self.period = period
+        self.overrun = overrun
+        self.stagger = stagger
+        self.align = align
+        self.backlog = backlog
+        self.tolerance = tolerance
+        # deadline of the current round, in seconds since the epoch
+        self.deadline = None
+        self.rounds = 0
+        self.skipped = 0
+        # running mean, sum of squared deviations and maximum of the lateness of rounds
+        self.mean = 0.0
+        self.squares = 0.0
+        self.latest = 0.0
+        self.worst = 0.0
+
+    def wait(self, idle=None):
+        """
+            Sleep until the deadline of the next round
+        Args:
+            idle: called at least every IDLE_STEP seconds while sleeping, for housekeeping between rounds
+
+        Returns:
+            deadline of the round, in seconds since the epoch
+
+        """
+        now = time()
+        if self.period <= 0:
+            self.deadline = now
+        elif self.deadline is None:
+            self.deadline = math.ceil(now / self.period) * self.period if self.align else now
+        else:
+            self.deadline += self.period
+            if self.overrun == SKIP:
+                # a deadline is missed once it is further behind than the tolerance, a slightly late round fires now
+                missed = math.floor((now - self.deadline) / self.period - self.tolerance) + 1
+            else:
+                missed = math.floor((now - self.deadline) / self.period) - self.backlog
+            if missed > 0:
+                self.deadline += missed * self.period
+                self.skipped += missed
+        self.sleep_until(self.deadline, idle)
+        self.record(time() - self.deadline)
+        return self.deadline
+
+    def sleep_until(self, moment, idle=None):
+        remaining = moment - time()
+        while remaining > 0:
+            if idle is None:
+                sleep(remaining)
+            else:
+                idle()
+                sleep(min(remaining, IDLE_STEP))
+            remaining = moment - time()
+
+    def offsets(self, count):
+        """
+            Start of each of count parts of a round, in seconds after its deadline, spread evenly over the stagger
+        """
+        if count == 0:
+            return []
+        spacing = self.period * self.stagger / count
+        return [i * spacing for i in range(count)]
+
+    def record(self, lateness):
+        self.rounds += 1
+        self.latest = lateness
+        self.worst = max(self.worst, lateness)
+        delta = lateness - self.mean
+        self.mean += delta / self.rounds
+        self.squares += delta * (lateness - self.mean)
+
+    def stats(self):
+        """
+            Lateness of the rounds, in seconds, jitter being its standard deviation
+        """
+        jitter = math.sqrt(self.squares / self.rounds) if self.rounds else 0.0
+        return {"rounds": self.rounds, "skipped": self.skipped, "last": self.latest, "mean": self.mean,
+                "max": self.worst, "jitter": jitter}
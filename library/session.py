@@ -0,0 +1,106 @@
+import sys
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+##############################################################
+
+# number of hosts to keep connection pools for
+POOL_CONNECTIONS = 4
+# number of keep-alive connections per host
+POOL_MAXSIZE = 16
+# (connect, read) timeout of every request, in seconds
+TIMEOUT = (3.05, 10)
+# number of retries on failed connections
+MAX_RETRIES = 2
+
+##############################################################
+
+
+class Session(requests.Session):
+    """
+        HTTP session shared by all market data calls, keeps connections alive in a bounded pool per host and applies
+        default timeouts
+
+    Args:
+        pool_connections: number of hosts to keep connection pools for
+        pool_maxsize: number of keep-alive connections per host, extra threads wait for a free connection
+        timeout: default (connect, read) timeout, in seconds
+        max_retries: number of retries on failed connections
+    """
+
+    def __init__(self, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, timeout=TIMEOUT,
+                 max_retries=MAX_RETRIES):
+        super().__init__()
+        self.timeout = timeout
+        self.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                              max_retries=max_retries, pool_block=True)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+    def stats(self):
+        """
+            Connection reuse statistics of the pools
+        Returns:
+            dict mapping each host to the number of connections opened, requests sent and requests served over
+            reused connections
+
+        """
+        stats = dict()
+        for adapter in set(self.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host = stats.setdefault(pool.host, {"connections": 0, "requests": 0, "reused": 0})
+                host["connections"] += pool.num_connections
+                host["requests"] += pool.num_requests
+                host["reused"] += max(pool.num_requests - pool.num_connections, 0)
+        return stats
+
+
+session = None
+lock = threading.Lock()
+
+
+def configure_session(**kwargs):
+    """
+        Replace the shared session with one built from the given Session arguments
+    """
+    global session
+    with lock:
+        if session is not None:
+            session.close()
+        session = Session(**kwargs)
+    return session
+
+
+def get_session():
+    """
+        Shared session, created with default settings on first use
+    """
+    global session
+    with lock:
+        if session is None:
+            session = Session()
+        return session
+
+
+def session_stats():
+    return get_session().stats()
+
+
+def ssl_errors():
+    """
+        Exception types of pyOpenSSL worth retrying on. pyOpenSSL can only raise once it has been imported by the
+        HTTP stack, so it is never imported here just to name its exceptions
+    """
+    module = sys.modules.get("OpenSSL.SSL")
+    return module.SysCallError if module is not None else ()
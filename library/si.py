@@ -1,18 +1,48 @@
-import requests
-import pandas as pd
+from time import time
+
+from requests import RequestException
+
+from .history import get_history
+from .session import get_session
+
+##############################################################
+
+# bar intervals offered by the chart endpoint
+INTERVALS = ("1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h", "1d", "5d", "1wk", "1mo", "3mo")
+# intervals of bars within a day, these are not floored to the day
+INTRADAY = ("1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h")
+# length of the bars of the intraday intervals, in seconds, 1h duplicates 60m
+INTRADAY_SECONDS = {"1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "90m": 5400}
+# days of intraday bars kept by the chart endpoint, a request reaching further back is rejected
+INTRADAY_DAYS = {"1m": 7, "60m": 730, "1h": 730}
+# days of intraday bars kept for intervals not listed above
+INTRADAY_DEFAULT_DAYS = 60
+# days of bars requested for the latest closes, enough to reach back over a weekend
+RECENT_DAYS = 5
+
+##############################################################
 
 
 base_url = "https://query1.finance.yahoo.com/v8/finance/chart/"
+quote_url = "https://query1.finance.yahoo.com/v7/finance/quote"
+headers = {
+    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/80.0.3987.163 Safari/537.36"
+}
 
 
 def build_url(ticker, start_date=None, end_date=None, interval="1d"):
+    # pandas is heavy to import and only needed for history, it is imported by the functions using it
+    import pandas as pd
 
     if end_date is None:
         end_seconds = int(pd.Timestamp("now").timestamp())
     else:
         end_seconds = int(pd.Timestamp(end_date).timestamp())
 
-    if start_date is None:
+    if start_date is None and interval.lower() in INTRADAY:
+        # intraday bars only go back so far, ask for all of them
+        start_seconds = end_seconds - INTRADAY_DAYS.get(interval.lower(), INTRADAY_DEFAULT_DAYS) * 24 * 60 * 60 + 60
+    elif start_date is None:
         start_seconds = 7223400
     else:
         start_seconds = int(pd.Timestamp(start_date).timestamp())
@@ -24,26 +54,104 @@ def build_url(ticker, start_date=None, end_date=None, interval="1d"):
     return site, params
 
 
-def get_data(ticker, start_date=None, end_date=None, index_as_date=True, interval="1d"):
-    if interval not in ("1d", "1wk", "1mo"):
-        raise AssertionError("interval must be of of '1d', '1wk', or '1mo'")
+def get_data(ticker, start_date=None, end_date=None, index_as_date=True, interval="1d", cache=False):
+    """
+        Fetch the OHLCV history of a ticker. Cached history is extended with the bars after the last cached one,
+        instead of downloading the whole history again, history is only cached when asked for
+    Args:
+        ticker: ticker of the stock
+        start_date: first date included
+        end_date: date excluded onwards
+        index_as_date: index the frame by date, otherwise keep the date in a column
+        interval: one of INTERVALS, bars of intraday intervals are indexed by their time instead of their day
+        cache: go through the on-disk history cache, kept in the directory of get_history
+
+    Returns:
+        DataFrame with open, high, low, close, adjclose, volume and ticker columns
+
+    """
+    import pandas as pd
 
+    if interval not in INTERVALS:
+        raise AssertionError(f"interval must be one of {', '.join(INTERVALS)}")
+
+    if not cache:
+        return fetch_data(ticker, start_date, end_date, index_as_date, interval)
+
+    frame = cached_data(ticker, end_date, interval)
+    if start_date is not None:
+        frame = frame[frame.index >= pd.Timestamp(start_date)]
+    if end_date is not None:
+        frame = frame[frame.index < pd.Timestamp(end_date)]
+
+    if not index_as_date:
+        frame = frame.reset_index()
+        frame.rename(columns={"index": "date"}, inplace=True)
+
+    return frame
+
+
+def fetch_data(ticker, start_date=None, end_date=None, index_as_date=True, interval="1d"):
     # build and connect to URL
     site, params = build_url(ticker, start_date, end_date, interval)
-    resp = requests.get(site, params=params, headers={
-        "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/80.0.3987.163 Safari/537.36"
-    })
+    resp = get_session().get(site, params=params, headers=headers)
 
     if not resp.ok:
         raise AssertionError(resp.json())
 
-    data = resp.json()
+    return parse_data(resp.json(), ticker, index_as_date, interval)
+
+
+def cached_data(ticker, end_date, interval):
+    """
+        Whole history of a ticker from the cache, brought up to date with the bars since the last cached one
+    """
+    import pandas as pd
+
+    history = get_history()
+    frame, age = history.load(ticker, interval)
+    if frame is not None and not frame.empty:
+        # every bar before the end is final when the cache holds a later bar
+        if history.offline or age < history.ttl or \
+                (end_date is not None and pd.Timestamp(end_date) <= frame.index[-1]):
+            return frame
+        try:
+            fetched = fetch_data(ticker, frame.index[-1], interval=interval)
+        except RequestException:
+            # work on with the cached history while offline
+            return frame
+    else:
+        fetched = fetch_data(ticker, interval=interval)
+    frame = history.merge(frame, fetched)
+    history.save(ticker, interval, frame)
+    return frame
+
+
+def parse_data(data, ticker, index_as_date=True, interval="1d"):
+    """
+        Build the OHLCV DataFrame from a decoded chart response
+    Args:
+        data: decoded JSON response of the chart endpoint
+        ticker: ticker of the stock
+        index_as_date: index the frame by date, otherwise keep the date in a column
+        interval: interval of the bars, bars of a day or longer are indexed by their day
+
+    Returns:
+        DataFrame with open, high, low, close, adjclose, volume and ticker columns
 
-    frame = pd.DataFrame(data["chart"]["result"][0]["indicators"]["quote"][0])
-    frame["adjclose"] = data["chart"]["result"][0]["indicators"]["adjclose"][0]["adjclose"]
-    temp_time = data["chart"]["result"][0]["timestamp"]
-    frame.index = pd.to_datetime(temp_time, unit="s")
-    frame.index = frame.index.map(lambda dt: dt.floor("d"))
+    """
+    import pandas as pd
+
+    result = data["chart"]["result"][0]
+    frame = pd.DataFrame(result["indicators"]["quote"][0])
+    # intraday responses carry no adjusted close, nothing is adjusted within a day
+    if "adjclose" in result["indicators"]:
+        frame["adjclose"] = result["indicators"]["adjclose"][0]["adjclose"]
+    else:
+        frame["adjclose"] = frame["close"]
+    frame.index = pd.to_datetime(result.get("timestamp", []), unit="s")
+    if interval not in INTRADAY:
+        frame.index = frame.index.floor("D")
     frame = frame[["open", "high", "low", "close", "adjclose", "volume"]]
     frame['ticker'] = ticker.upper()
 
@@ -54,6 +162,88 @@ def get_data(ticker, start_date=None, end_date=None, index_as_date=True, interva
     return frame
 
 
+def bar_interval(period):
+    """
+        Intraday interval whose bars are period seconds long, None if no interval matches
+    """
+    for interval, seconds in INTRADAY_SECONDS.items():
+        if seconds == period:
+            return interval
+    return None
+
+
+def get_recent_closes(ticker, count, interval="1m"):
+    """
+        Fetch the latest closes of a ticker in a single request, bars which never traded are left out
+    Args:
+        ticker: ticker of the stock
+        count: most closes returned
+        interval: interval of the bars, one of INTRADAY
+
+    Returns:
+        list of up to count closes, oldest first
+
+    """
+    if interval not in INTRADAY:
+        raise AssertionError(f"interval must be one of {', '.join(INTRADAY)}")
+
+    # a few days of bars are enough to cover nights and weekends, history is not cached as the latest bars matter
+    end_seconds = int(time())
+    params = {"period1": end_seconds - RECENT_DAYS * 24 * 60 * 60, "period2": end_seconds, "interval": interval}
+    resp = get_session().get(base_url + ticker, params=params, headers=headers)
+
+    if not resp.ok:
+        raise AssertionError(resp.json())
+
+    result = resp.json()["chart"]["result"][0]
+    closes = [close for close in result["indicators"]["quote"][0].get("close", []) if close is not None]
+    return closes[-count:] if count > 0 else []
+
+
 def get_live_price(ticker):
-    df = get_data(ticker, end_date=pd.Timestamp.today() + pd.DateOffset(10))
-    return df.close[-1]
+    """
+        Fetch the live price of a ticker, asks only for the current day's bar and skips building a DataFrame
+    Args:
+        ticker: ticker of the stock
+
+    Returns:
+        regular market price, or the latest close if the quote has none
+
+    """
+    resp = get_session().get(base_url + ticker, params={"range": "1d", "interval": "1d"}, headers=headers)
+
+    if not resp.ok:
+        raise AssertionError(resp.json())
+
+    result = resp.json()["chart"]["result"][0]
+    price = result["meta"].get("regularMarketPrice")
+    if price is None:
+        price = [close for close in result["indicators"]["quote"][0]["close"] if close is not None][-1]
+    return price
+
+
+def get_live_prices(tickers):
+    """
+        Fetch live prices of several tickers in a single request
+    Args:
+        tickers: iterable of tickers
+
+    Returns:
+        dict mapping each ticker to its live price, tickers without a quote are left out
+
+    """
+    requested = {ticker.upper(): ticker for ticker in tickers}
+    if not requested:
+        return dict()
+
+    resp = get_session().get(quote_url, params={"symbols": ",".join(requested), "fields": "symbol,regularMarketPrice"}, headers=headers)
+
+    if not resp.ok:
+        raise AssertionError(resp.json())
+
+    prices = dict()
+    for quote in resp.json()["quoteResponse"]["result"]:
+        ticker = requested.get(quote.get("symbol", "").upper())
+        if ticker is not None and quote.get("regularMarketPrice") is not None:
+            prices[ticker] = quote["regularMarketPrice"]
+    return prices
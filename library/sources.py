@@ -0,0 +1,267 @@
+import datetime
+import json
+import os
+import random
+import threading
+from abc import ABC, abstractmethod
+
+from .si import bar_interval, get_live_price, get_live_prices, get_recent_closes
+from .ticks import TickReader, is_tick_file
+
+##############################################################
+
+# price every synthetic ticker starts from
+SYNTHETIC_START = 100.0
+# standard deviation of the relative change of a synthetic price per tick
+SYNTHETIC_VOLATILITY = 0.002
+# number of tickers offered by the synthetic source when none are given
+SYNTHETIC_TICKERS = 5
+# format of the day directories the Miner writes captures to
+DAY_FORMAT = "%d-%m-%Y"
+
+##############################################################
+
+
+class PriceSource(ABC):
+    """
+        Interface of everything prices can be fetched from
+    """
+
+    @abstractmethod
+    def get_price(self, ticker):
+        """
+            Price of a ticker, LookupError if the source cannot price it
+        """
+
+    def get_prices(self, tickers):
+        """
+            Fetch prices of several tickers, tickers which could not be priced are left out
+        """
+        prices = dict()
+        for ticker in tickers:
+            try:
+                prices[ticker] = self.get_price(ticker)
+            except LookupError:
+                pass
+        return prices
+
+    def get_recent_prices(self, ticker, count, period):
+        """
+            Latest count prices of a ticker one period apart, oldest first, to fill a window of prices without waiting
+            for them. Sources without history give their next count prices
+        """
+        return [self.get_price(ticker) for _ in range(count)]
+
+    def can_warm(self, period):
+        """
+            Whether recent prices one period apart, in seconds, can be given by get_recent_prices
+        """
+        return True
+
+    def candidates(self):
+        """
+            Tickers the source can price, None if it is not limited to a known set
+        """
+        return None
+
+
+class LiveSource(PriceSource):
+    """
+        Live prices from Yahoo Finance
+    """
+
+    def get_price(self, ticker):
+        return get_live_price(ticker)
+
+    def get_prices(self, tickers):
+        return get_live_prices(tickers)
+
+    def get_recent_prices(self, ticker, count, period):
+        # one bar per period of the traders
+        interval = bar_interval(period)
+        if interval is None:
+            raise LookupError(f"No intraday bars are {period} seconds long")
+        return get_recent_closes(ticker, count, interval)
+
+    def can_warm(self, period):
+        return bar_interval(period) is not None
+
+
+def read_capture(path):
+    """
+        Open a capture written by the edartMine Miner, either a tick file or a JSON capture of the older format
+    Args:
+        path: path of the capture
+
+    Returns:
+        ticker and iterable of (time of day, price) ticks, tick files are streamed lazily, None if the file is not
+        a capture
+
+    """
+    if is_tick_file(path):
+        reader = TickReader(path)
+        with open(path, "r") as fp:
+            ticker = fp.readline().rstrip("\n")
+        return ticker, reader
+    with open(path, "r") as fp:
+        src = json.loads(fp.read())
+    if not isinstance(src, dict) or "ticker" not in src or "data" not in src:
+        return None
+    return src["ticker"], src["data"].items()
+
+
+def load_capture(path):
+    """
+        Load a capture written by the edartMine Miner
+    Args:
+        path: path of the capture
+
+    Returns:
+        ticker and list of (time of day, price) ticks, None if the file is not a capture
+
+    """
+    capture = read_capture(path)
+    if capture is None:
+        return None
+    return capture[0], list(capture[1])
+
+
+def capture_day(path):
+    """
+        Day a capture was recorded on, from the name of its day directory, None for a capture outside of one
+    """
+    try:
+        return datetime.datetime.strptime(os.path.basename(os.path.dirname(os.path.abspath(path))), DAY_FORMAT).date()
+    except ValueError:
+        return None
+
+
+def find_captures(paths):
+    """
+        Capture files among paths, those found in a directory come in chronological order of their day directories,
+        which do not sort by name, captures outside of a day directory first
+    """
+    captures = list()
+    for path in paths:
+        if os.path.isdir(path):
+            found = list()
+            for root, _, files in os.walk(path):
+                found.extend(os.path.join(root, file) for file in files if file.endswith(".json") or is_tick_file(file))
+            found.sort(key=lambda capture: (capture_day(capture) or datetime.date.min, capture))
+            captures.extend(found)
+        else:
+            captures.append(path)
+    return captures
+
+
+class ReplaySource(PriceSource):
+    """
+        Replays ticks recorded by the edartMine Miner, every call returns the next recorded tick of the ticker and the
+        recording starts over once it runs out. Captures are read from disk one file at a time, as they are reached
+
+    Args:
+        paths: capture files or directories containing them
+    """
+
+    def __init__(self, *paths):
+        # capture files of each ticker, named after the ticker by the Miner
+        self.files = dict()
+        # absolute paths survive the working directory changes of the application
+        for path in find_captures([os.path.abspath(path) for path in paths]):
+            ticker = os.path.splitext(os.path.basename(path))[0]
+            self.files.setdefault(ticker, list()).append(path)
+        self.streams = dict()
+        self.lock = threading.Lock()
+
+    def stream(self, ticker):
+        while True:
+            replayed = 0
+            for path in self.files[ticker]:
+                capture = read_capture(path)
+                if capture is None:
+                    continue
+                for _, price in capture[1]:
+                    replayed += 1
+                    yield price
+            if replayed == 0:
+                raise LookupError(f"No ticks recorded for {ticker}")
+
+    def get_price(self, ticker):
+        with self.lock:
+            if ticker not in self.files:
+                raise LookupError(f"No capture found for {ticker}")
+            if ticker not in self.streams:
+                self.streams[ticker] = self.stream(ticker)
+            try:
+                return next(self.streams[ticker])
+            except StopIteration:
+                # a stream which found no ticks is over, every later call ends up here
+                raise LookupError(f"No ticks recorded for {ticker}") from None
+
+    def candidates(self):
+        return list(self.files)
+
+
+class SyntheticSource(PriceSource):
+    """
+        In-memory random walk of every ticker, deterministic for a given seed
+
+    Args:
+        seed: seed of the random walks
+        tickers: tickers offered as candidates, any other ticker can be priced as well
+        start: price every ticker starts from
+        volatility: standard deviation of the relative change per tick
+    """
+
+    def __init__(self, seed=0, tickers=None, start=SYNTHETIC_START, volatility=SYNTHETIC_VOLATILITY):
+        self.seed = seed
+        self.tickers = tickers if tickers is not None else [f"SYN{i}" for i in range(SYNTHETIC_TICKERS)]
+        self.start = start
+        self.volatility = volatility
+        # (random generator, last price) of each ticker
+        self.walks = dict()
+        self.lock = threading.Lock()
+
+    def get_price(self, ticker):
+        with self.lock:
+            if ticker not in self.walks:
+                self.walks[ticker] = (random.Random(f"{self.seed}:{ticker}"), self.start)
+            rng, price = self.walks[ticker]
+            price = round(price * (1 + rng.gauss(0, self.volatility)), 2)
+            self.walks[ticker] = (rng, price)
+            return price
+
+    def candidates(self):
+        return list(self.tickers)
+
+
+def make_source(spec):
+    """
+        Build a price source from its command line description
+    Args:
+        spec: 'live', 'synthetic', 'synthetic:<seed>' or 'replay:<path>[,<path>...]'
+
+    Returns:
+        PriceSource
+
+    """
+    kind, _, arg = spec.partition(":")
+    if kind == "live" and not arg:
+        return LiveSource()
+    if kind == "synthetic":
+        return SyntheticSource(int(arg)) if arg else SyntheticSource()
+    if kind == "replay" and arg:
+        return ReplaySource(*arg.split(","))
+    raise ValueError(f"Unknown price source '{spec}', expected live, synthetic[:seed] or replay:path")
+
+
+source = LiveSource()
+
+
+def set_source(new_source):
+    global source
+    source = new_source
+
+
+def get_source():
+    return source
@@ -0,0 +1,183 @@
+import argparse
+import datetime
+import os
+
+import numpy as np
+import pytz
+
+from .sources import DAY_FORMAT, capture_day, find_captures, read_capture
+
+##############################################################
+
+# fixed width columns of every ticker, timestamps in seconds since the epoch and prices
+TIME_COLUMN = ("time.i8", np.dtype("<i8"))
+PRICE_COLUMN = ("price.f8", np.dtype("<f8"))
+# time zone the Miner records the time of day of ticks in
+TZ = pytz.timezone('Europe/London')
+
+##############################################################
+
+
+def map_column(path, dtype, rows):
+    """
+        Map the first rows of a column file as a read-only array, without copying it into memory
+    """
+    if rows == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+
+
+class TickStore:
+    """
+        Columnar store of ticks, every ticker has a directory holding one raw file per column. Columns are appended in
+        chronological order and loaded as memory-mapped NumPy arrays, so loading costs nothing until values are read
+
+    Args:
+        root: directory of the store, created by the first append, reading a missing store finds no ticks
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, ticker, column):
+        return os.path.join(self.root, ticker, column[0])
+
+    def rows(self, ticker):
+        """
+            Number of complete ticks of a ticker, a row only partly written by a crash is left out
+        """
+        sizes = list()
+        for column in (TIME_COLUMN, PRICE_COLUMN):
+            path = self.path(ticker, column)
+            sizes.append(os.path.getsize(path) // column[1].itemsize if os.path.exists(path) else 0)
+        return min(sizes)
+
+    def tickers(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(entry for entry in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, entry)))
+
+    def append(self, ticker, times, prices):
+        """
+            Append ticks of a ticker, later than every tick already stored
+        Args:
+            ticker: ticker the ticks belong to
+            times: datetime64 or seconds since the epoch of the ticks
+            prices: prices of the ticks
+
+        """
+        times = np.asarray(times)
+        if np.issubdtype(times.dtype, np.datetime64):
+            times = times.astype("datetime64[s]").astype(np.int64)
+        times = times.astype(TIME_COLUMN[1])
+        prices = np.asarray(prices, dtype=PRICE_COLUMN[1])
+        if times.shape != prices.shape:
+            raise ValueError("Every tick needs a time and a price")
+        os.makedirs(os.path.join(self.root, ticker), exist_ok=True)
+        rows = self.rows(ticker)
+        # drop a row left partly written by a crash before appending behind it
+        for column in (TIME_COLUMN, PRICE_COLUMN):
+            path = self.path(ticker, column)
+            with open(path, "ab") as fp:
+                fp.truncate(rows * column[1].itemsize)
+        with open(self.path(ticker, TIME_COLUMN), "ab") as fp:
+            fp.write(times.tobytes())
+        with open(self.path(ticker, PRICE_COLUMN), "ab") as fp:
+            fp.write(prices.tobytes())
+
+    def last_time(self, ticker):
+        rows = self.rows(ticker)
+        if rows == 0:
+            return None
+        return int(map_column(self.path(ticker, TIME_COLUMN), TIME_COLUMN[1], rows)[-1])
+
+    def load(self, ticker, start=None, end=None):
+        """
+            Memory-mapped ticks of a ticker, optionally limited to a period
+        Args:
+            ticker: ticker to load
+            start: earliest time included, aware datetime, or naive datetime or datetime64 in UTC
+            end: time excluded onwards, aware datetime, or naive datetime or datetime64 in UTC
+
+        Returns:
+            datetime64[s] array of times in UTC and float array of prices, both views of the files on disk
+
+        """
+        rows = self.rows(ticker)
+        times = map_column(self.path(ticker, TIME_COLUMN), TIME_COLUMN[1], rows)
+        prices = map_column(self.path(ticker, PRICE_COLUMN), PRICE_COLUMN[1], rows)
+        first, last = 0, rows
+        if start is not None:
+            first = np.searchsorted(times, epoch_seconds(start))
+        if end is not None:
+            last = np.searchsorted(times, epoch_seconds(end))
+        return times[first:last].view("datetime64[s]"), prices[first:last]
+
+
+def epoch_seconds(moment):
+    if isinstance(moment, datetime.datetime) and moment.tzinfo is not None:
+        return int(moment.timestamp())
+    return np.datetime64(moment, "s").astype(np.int64)
+
+
+def capture_times(day, ticks, tz=TZ):
+    """
+        Seconds since the epoch of ticks recorded on a day as time of day strings, in the time zone of the Miner
+    """
+    date = datetime.datetime.strptime(day, DAY_FORMAT).date()
+    seconds = list()
+    for now in ticks:
+        hours, minutes, secs = now.split(":")
+        moment = datetime.datetime.combine(date, datetime.time(int(hours), int(minutes), int(secs)))
+        seconds.append(int(tz.localize(moment).timestamp()))
+    return np.array(seconds, dtype=np.int64)
+
+
+def import_captures(store, paths):
+    """
+        Import captures of the Miner, JSON or tick files in day directories, into the store. Days already in the
+        store are skipped, so an import can be repeated as new days are captured
+    Args:
+        store: TickStore to import into
+        paths: capture files or directories containing them
+
+    Returns:
+        dict of the number of ticks imported per ticker
+
+    """
+    captures = [(capture_day(path), path) for path in find_captures(paths)]
+    imported = dict()
+    # ticks have to be appended in chronological order, whatever the order of the paths
+    for date, path in sorted((date, path) for date, path in captures if date is not None):
+        day = date.strftime(DAY_FORMAT)
+        capture = read_capture(path)
+        if capture is None:
+            continue
+        ticker, ticks = capture
+        ticks = list(ticks)
+        if not ticks:
+            continue
+        times = capture_times(day, [now for now, _ in ticks])
+        last = store.last_time(ticker)
+        if last is not None:
+            keep = times > last
+            times, ticks = times[keep], [tick for tick, kept in zip(ticks, keep) if kept]
+        store.append(ticker, times, [price for _, price in ticks])
+        imported[ticker] = imported.get(ticker, 0) + len(ticks)
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="tickstore", description="Import edartMine captures into a tick store")
+    parser.add_argument("store", help="Directory of the tick store")
+    parser.add_argument("paths", nargs="+", help="Capture files or directories containing them")
+    args = parser.parse_args()
+
+    imported = import_captures(TickStore(args.store), args.paths)
+    for ticker in sorted(imported):
+        print(f"{ticker:<12}{imported[ticker]:>10}")
+    print(f"{'TOTAL':<12}{sum(imported.values()):>10}")
+
+
+if __name__ == "__main__":
+    main()
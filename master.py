@@ -2,16 +2,29 @@ import datetime
 import json
 import os
 from collections import deque
-from time import sleep
-from library import Notify, get_live_price
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from library import Notify, get_source, session_stats
+from library.ichimoku import ichimoku_lines, DISPLACEMENT
+from library.metrics import decision_time, fetch_latency, get_metrics, retries, round_lateness, \
+    round_time, METRICS_FILE
+from library.profiling import get_profiler
+from library.scheduler import Scheduler, SKIP
+from book import TraderBook
 from trader import Trader, DATA_LIMIT
+import numpy as np
 import pytz
 
 TZ = pytz.timezone('Europe/London')
+# number of tickers priced by a single batch request
+BATCH_SIZE = 50
+# number of concurrent price requests
+WORKERS = 8
 
 # Manages all the traders
 class Master:
-    def __init__(self, PERIOD_INTERVAL, master_logger, FEASIBLE_PERCENT, ACCOUNT, PACK_UP, DEV_MODE):
+    def __init__(self, PERIOD_INTERVAL, master_logger, FEASIBLE_PERCENT, ACCOUNT, PACK_UP, DEV_MODE, WORKERS=WORKERS,
+                 BOOK_MODE=False, STAGGER=0.0, OVERRUN=SKIP):
         self.traders = deque()
         self.period = PERIOD_INTERVAL
         self.logger = master_logger
@@ -19,6 +32,13 @@ class Master:
         self.account = ACCOUNT
         self.pack_up = PACK_UP
         self.isDevMode = DEV_MODE
+        # pool of threads fetching prices concurrently within a round
+        self.executor = ThreadPoolExecutor(max_workers=WORKERS)
+        # rounds of observation and trading fire on the same grid of wall clock deadlines
+        self.scheduler = Scheduler(PERIOD_INTERVAL, OVERRUN, STAGGER)
+        # decide for all traders at once on a columnar book, built when trading begins
+        self.book_mode = BOOK_MODE
+        self.book = None
         
     # check if required directories exist, if not, make them
     @staticmethod
@@ -40,24 +60,139 @@ class Master:
             Notify.info(f"Successfully connected Trader #{count} to {ticker}", delay=0.01)
             count += 1
         self.logger.info("Trader lineup complete")
-        print("")
+        Notify.write()
 
-    # initialise traders
-    def init_traders(self, Tmode=False):
+    # initialise traders, a warm start fills the windows of prices from history instead of observing them live
+    def init_traders(self, Tmode=False, warm=False):
         global ml
 
         Notify.info("Traders are in Observation phase")
         self.logger.info("Traders entered Observation Phase")
         if not Tmode:
-            self.print_progress_bar(0, 80, prefix='Progress:', suffix='Complete', length=40)
-            for i in range(DATA_LIMIT):
+            observed = self.warm_start() if warm else 0
+            self.print_progress_bar(observed, 80, prefix='Progress:', suffix='Complete', length=40)
+            # observe live whatever history could not fill
+            for i in range(observed, DATA_LIMIT):
+                self.wait_round()
+                prices = self.fetch_prices()
                 for trader in self.traders:
-                    trader.get_initial_data()
+                    trader.get_initial_data(prices.get(trader.ticker))
                 self.print_progress_bar(i + 1, 80, prefix='\tProgress:', suffix='Complete', length=40)
-                sleep(self.period)
+            self.log_observed_lines()
         Notify.info("\tStatus : Complete")
         self.logger.info("Observation Phase complete")
-        print("")
+        Notify.write()
+
+    # fill the windows of prices of all traders from their latest prices, one concurrent request per ticker
+    def warm_start(self):
+        source = get_source()
+        if not source.can_warm(self.period):
+            self.logger.warning("No history one period of %s seconds apart, observing live instead", self.period)
+            return 0
+        futures = [(trader, self.executor.submit(source.get_recent_prices, trader.ticker, DATA_LIMIT, self.period))
+                   for trader in self.traders]
+        observed = DATA_LIMIT
+        for trader, future in futures:
+            try:
+                prices = future.result()
+            except Exception as e:
+                self.logger.error("Could not fetch recent prices of %s : %s", trader.ticker, e)
+                prices = list()
+            for price in prices:
+                trader.get_initial_data(price)
+            observed = min(observed, len(prices))
+        self.logger.info("Warm start filled %s of %s observations", observed, DATA_LIMIT)
+        return observed
+
+    # one round of trading, every trader decides on a freshly fetched price
+    def run_round(self, count):
+        start = perf_counter()
+        prices = self.fetch_prices()
+        if self.book_mode:
+            self.run_book(prices)
+        else:
+            for trader in self.traders:
+                trader.run(prices.get(trader.ticker))
+        self.logger.info("Completed round %s", count)
+        round_time.observe(perf_counter() - start)
+
+    # evaluate the decisions of all traders in one vectorised pass over the book
+    def run_book(self, prices):
+        traders = list(self.traders)
+        if self.book is None:
+            self.book = TraderBook.from_traders(traders)
+        column = np.array([prices.get(trader.ticker, np.nan) for trader in traders], dtype=float)
+        # keep the previous price of tickers which could not be priced this round
+        missing = np.isnan(column)
+        if missing.any():
+            self.logger.warning("Keeping previous price of %s", ", ".join(np.array(self.book.tickers)[missing]))
+            column[missing] = self.book.latest()[missing]
+        start = perf_counter()
+        orders, cash_outs = self.book.step(column)
+        decision_time.observe(perf_counter() - start, "book")
+        for order in orders:
+            traders[order.index].record(order.action, order.trade, order.price)
+        for index, message in cash_outs:
+            traders[index].out_of_cash(message)
+
+    # wait for the deadline of the next round
+    def wait_round(self):
+        self.scheduler.wait()
+        stats = self.scheduler.stats()
+        round_lateness.observe(max(stats["last"], 0))
+        self.logger.debug("Round %s late by %.3f s, %s rounds skipped so far", stats["rounds"], stats["last"],
+                          stats["skipped"])
+
+    # fetch live prices of all traders concurrently, in batches, traders fetch their own price if it is still missing
+    def fetch_prices(self):
+        tickers = [trader.ticker for trader in self.traders]
+        # every round collects into a fresh dict and waits for all of its requests, so rounds never mix
+        prices = dict()
+        batches = [tickers[i:i + BATCH_SIZE] for i in range(0, len(tickers), BATCH_SIZE)]
+        futures = list()
+        # batches are spread over the staggered part of the period, to smooth out bursts of requests
+        for batch, offset in zip(batches, self.scheduler.offsets(len(batches))):
+            if offset:
+                self.scheduler.sleep_until(self.scheduler.deadline + offset)
+            futures.append(self.executor.submit(self.timed_fetch, get_source().get_prices, batch))
+        for future in futures:
+            try:
+                prices.update(future.result())
+            except Exception as e:
+                self.logger.error("Batch price fetch failed, falling back to individual requests : %s", e)
+        # price tickers missing from the batches individually, still concurrently
+        missing = {ticker: self.executor.submit(self.timed_fetch, get_source().get_price, ticker)
+                   for ticker in tickers if ticker not in prices}
+        if missing:
+            retries.inc(len(missing), "fetch")
+        for ticker, future in missing.items():
+            try:
+                prices[ticker] = future.result()
+            except Exception as e:
+                self.logger.error("Could not fetch price of %s : %s", ticker, e)
+        return prices
+
+    # fetch prices of a batch of tickers or of a single ticker, the latency is recorded against every ticker fetched
+    @staticmethod
+    def timed_fetch(fetch, tickers):
+        start = perf_counter()
+        try:
+            return fetch(tickers)
+        finally:
+            elapsed = perf_counter() - start
+            for ticker in ([tickers] if isinstance(tickers, str) else tickers):
+                fetch_latency.observe(elapsed, ticker)
+
+    # log the Ichimoku components observed by every trader, computed for all traders in a single call. Components lag
+    # the latest price by one period, as the ones traders decide on
+    def log_observed_lines(self):
+        if not self.traders:
+            return
+        lines = ichimoku_lines(np.array([trader.price.view() for trader in self.traders]))
+        for i, trader in enumerate(self.traders):
+            trader.logger.info(
+                "Observed status - Tenkan : %s, Kijun : %s, Senkou A : %s, Senkou B : %s", lines.tenkan[i, -2],
+                lines.kijun[i, -2], lines.senkou_A[i, -2 - DISPLACEMENT], lines.senkou_B[i, -2 - DISPLACEMENT])
 
     def print_progress_bar(self, iteration, total, prefix='', suffix='', decimals=1, length=100, fill='█', print_end="\r"):
         """
@@ -75,10 +210,10 @@ class Master:
         percent = ("{0:." + str(decimals) + "f}").format(100 * (iteration / float(total)))
         filled_length = int(length * iteration // total)
         bar = fill * filled_length + ' ' * (length - filled_length)
-        print('\r%s |%s| %s%% %s' % (prefix, bar, percent, suffix), end=print_end)
+        Notify.write('\r%s |%s| %s%% %s' % (prefix, bar, percent, suffix), end=print_end)
         # print new line on complete
         if iteration == total:
-            print()
+            Notify.write()
             
     # trading begins
     def start_trading(self, Tmode=False):
@@ -91,29 +226,39 @@ class Master:
         if not Tmode:
             while now.time() < self.pack_up or self.is_dev_mode:
                 try:
-                    for trader in self.traders:
-                        trader.run()
-                    self.logger.info(f"Completed round {count}")
-                    sleep(self.period)
+                    self.wait_round()
+                    # rounds are profiled one out of so many, when profiling the session
+                    with get_profiler().round(count):
+                        self.run_round(count)
                 except Exception as e:
                     Notify.fatal("Trading has been aborted")
-                    self.logger.critical("Trade abort due to unexpected error : ", e)
+                    self.logger.critical("Trade abort due to unexpected error : %s", e)
                     quit(0)
                 finally:
                     now = datetime.datetime.now(TZ)
                     count += 1
+            self.logger.info("HTTP connection stats : %s", session_stats())
+            self.logger.info("Round lateness stats : %s", self.scheduler.stats())
         else:
             Notify.info("Confirming access to live stock price...")
             self.logger.info("Confirming access to live stock price...")
-            for trader in self.traders:
-                try:
-                    get_live_price(trader.ticker)
-                except Exception as e:
-                    Notify.fatal("Error in fetching live stock price. Aborting")
-                    self.logger.critical("Error in fetching live stock price : ", e)
+            try:
+                prices = get_source().get_prices([trader.ticker for trader in self.traders])
+            except Exception as e:
+                Notify.fatal("Error in fetching live stock price. Aborting")
+                self.logger.critical("Error in fetching live stock price : %s", e)
+            else:
+                for trader in self.traders:
+                    if trader.ticker not in prices:
+                        Notify.fatal(f"Error in fetching live stock price of {trader.ticker}")
+                        self.logger.critical(f"No live stock price received for {trader.ticker}")
 
     # save master data
     def __del__(self):
+        self.executor.shutdown(wait=False)
+        # hand the state kept in the book back to the traders
+        if self.book is not None:
+            self.book.sync(self.traders)
         # load previous day's data
         prev_data = json.loads(open("..\\user_info.json").read())
         username = prev_data['username']
@@ -136,11 +281,13 @@ class Master:
             # check owed stocks
             if trader.IN_SHORT_TRADE:
                 new_data["stocks_to_buy_back"][trader.ticker] = {"buffer_price": trader.price_for_buffer}
-            # save trader database in respective files
-            del trader
+            # save trader database in respective files, before the metrics of the session are written
+            trader.save()
         # save master database
         with open("..\\user_info.json", "w") as fp:
             fp.write(json.dumps(new_data, indent=4))
+        # save the metrics of the session next to its databases
+        get_metrics().write(METRICS_FILE)
         # output profit
         Notify.info(f"\n\nNet Profit : $ {profit} \n")
         self.logger.info(f"\n\nNet Profit : $ {profit}  \n")
@@ -0,0 +1,69 @@
+import gc
+import json
+import logging
+import os
+import sys
+
+import pytest
+
+# the modules of the application live at the root of the repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from library import set_source
+from library.sources import SyntheticSource
+from trader import Trader
+
+# state of the previous session, nothing held over
+PREVIOUS = {"stocks_to_sell": dict(), "stocks_to_buy_back": dict()}
+
+
+class RecordingLogger(logging.Logger):
+    """
+        Logger keeping every formatted message instead of writing it out
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.records = list()
+
+    def _log(self, level, msg, args, **kwargs):
+        self.records.append(msg % args if args else msg)
+
+
+@pytest.fixture
+def walk():
+    """
+        Deterministic random walk of prices, rounded to cents so windows hold ties
+    """
+    def make(count, ticker="SYN0", seed=0):
+        source = SyntheticSource(seed)
+        return [source.get_price(ticker) for _ in range(count)]
+
+    return make
+
+
+@pytest.fixture
+def session_dir(tmp_path, monkeypatch):
+    """
+        Directory of the day of a session, traders and the master save their databases in the working directory
+    """
+    monkeypatch.chdir(tmp_path)
+    # the master saves the session next to the databases of the day, through a Windows style path
+    with open("..\\user_info.json", "w") as fp:
+        fp.write(json.dumps({"username": "test", "account_balance": 1000, **PREVIOUS}))
+    yield tmp_path
+    # traders and masters left behind save themselves while still in the directory
+    gc.collect()
+
+
+@pytest.fixture
+def traders(session_dir):
+    """
+        Build traders of the given tickers, priced by a synthetic source
+    """
+    def make(tickers, account=1000, seed=0):
+        set_source(SyntheticSource(seed, tickers))
+        return [Trader(i, ticker, account, prev_data=PREVIOUS, logger=RecordingLogger(ticker))
+                for i, ticker in enumerate(tickers)]
+
+    return make
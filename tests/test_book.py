@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from book import TraderBook
+from conftest import PREVIOUS, RecordingLogger
+from library.sources import SyntheticSource
+from trader import Trader, DATA_LIMIT
+
+# volatile enough for positions to be opened and stopped out
+VOLATILITY = 0.02
+TICKERS = [f"SYN{i}" for i in range(12)]
+
+
+class RecordingTrader(Trader):
+    """
+        Trader reporting its decisions in the form the book reports them, instead of logging them
+    """
+
+    def __init__(self, number, ticker, account):
+        super().__init__(number, ticker, account, prev_data=PREVIOUS, logger=RecordingLogger(ticker))
+        self.seen = SimpleNamespace(orders=list(), cash_outs=list())
+
+    def record(self, action, trade, price):
+        self.seen.orders.append((self.number, action, trade, price))
+
+    def out_of_cash(self, message):
+        self.seen.cash_outs.append((self.number, message))
+
+
+@pytest.fixture
+def prices():
+    source = SyntheticSource(3, TICKERS, volatility=VOLATILITY)
+    return np.array([[source.get_price(ticker) for ticker in TICKERS] for _ in range(DATA_LIMIT + 400)])
+
+
+@pytest.fixture
+def crews(session_dir, prices):
+    """
+        Two identical crews of traders which have observed the same prices
+    """
+    def make(accounts):
+        crews = [[RecordingTrader(i, ticker, account) for i, (ticker, account) in enumerate(zip(TICKERS, accounts))]
+                 for _ in range(2)]
+        for row in prices[:DATA_LIMIT]:
+            for crew in crews:
+                for trader, price in zip(crew, row.tolist()):
+                    trader.get_initial_data(price)
+        return crews
+
+    return make
+
+
+def state(trader):
+    return (trader.account, trader.IN_LONG_TRADE, trader.IN_SHORT_TRADE, trader.STOCKS_TO_SELL,
+            trader.STOCKS_TO_BUY_BACK, trader.price_for_buffer, trader.sold_price, trader.bought_price, trader.rounds,
+            list(trader.price), trader.ichimoku.snapshot(lag=1))
+
+
+def test_book_decides_like_traders(crews, prices):
+    # some traders start without enough money to buy, to be cashed out
+    alone, booked = crews([1000 if i % 4 else 50 for i in range(len(TICKERS))])
+    book = TraderBook.from_traders(booked)
+    orders, cash_outs = list(), list()
+    for row in prices[DATA_LIMIT:]:
+        expected = list()
+        for trader, price in zip(alone, row.tolist()):
+            start = len(trader.seen.cash_outs)
+            trader.run(price)
+            expected.extend(trader.seen.cash_outs[start:])
+        stepped, cashed = book.step(row)
+        orders.extend((order.index, order.action, order.trade, order.price) for order in stepped)
+        cash_outs.extend(cashed)
+        # within a round the book groups cash outs by kind, traders report them one after the other
+        assert sorted(cashed) == sorted(expected)
+    for i, trader in enumerate(alone):
+        assert [order for order in orders if order[0] == i] == trader.seen.orders
+    assert {action for _, action, _, _ in orders} == {"BUY", "SELL"} and cash_outs
+
+    book.sync(booked)
+    assert [state(trader) for trader in booked] == [state(trader) for trader in alone]
+
+
+def test_synced_traders_trade_on(crews, prices):
+    alone, booked = crews([1000] * len(TICKERS))
+    book = TraderBook.from_traders(booked)
+    for row in prices[DATA_LIMIT:DATA_LIMIT + 100]:
+        for trader, price in zip(alone, row.tolist()):
+            trader.run(price)
+        book.step(row)
+    book.sync(booked)
+    # traders handed back by the book decide as if they had traded all along
+    done = [len(trader.seen.orders) for trader in alone]
+    for row in prices[DATA_LIMIT + 100:]:
+        for crew in (alone, booked):
+            for trader, price in zip(crew, row.tolist()):
+                trader.run(price)
+    for trader, other, start in zip(alone, booked, done):
+        assert other.seen.orders == trader.seen.orders[start:]
+    assert any(trader.seen.orders for trader in booked)
+    assert [state(trader) for trader in booked] == [state(trader) for trader in alone]
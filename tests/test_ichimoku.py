@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+from library.ichimoku import IchimokuStream, ichimoku_lines, latest_mid, rolling_mid, DISPLACEMENT
+from library.ringbuffer import RingBuffer
+from trader import DATA_LIMIT
+
+
+def mid(window):
+    return (max(window) + min(window)) / 2
+
+
+def baseline_decision(price):
+    """
+        Components compared by the original Trader.make_decision, computed by slicing the window of prices
+    """
+    time = [i for i in range(-25, DATA_LIMIT + 27)]
+    tenkan_data = [mid(price[i:i + 9]) for i in range(DATA_LIMIT - 9)]
+    kijun_data = [mid(price[i:i + 26]) for i in range(DATA_LIMIT - 26)]
+    x5 = time[78:78 + DATA_LIMIT - 26]
+    x6 = time[104:104 + DATA_LIMIT - 52]
+    senkou_A_data = [(tenkan_data[i + 17] + kijun_data[i]) / 2 for i in range(DATA_LIMIT - 26)]
+    senkou_B_data = [mid(price[i:i + 52]) for i in range(DATA_LIMIT - 52)]
+    x = time[26:26 + DATA_LIMIT][-1]
+    return price[-1], tenkan_data[-1], kijun_data[-1], senkou_A_data[x5.index(x)], senkou_B_data[x6.index(x)]
+
+
+def baseline_plot(data):
+    """
+        Lines of the original plotter, computed by slicing the whole series
+    """
+    tenkan_data = [mid(data[i:i + 9]) for i in range(len(data) - 9)]
+    kijun_data = [mid(data[i:i + 26]) for i in range(len(data) - 26)]
+    senkou_A_data = [(tenkan_data[i + 17] + kijun_data[i]) / 2 for i in range(len(data) - 26)]
+    senkou_B_data = [mid(data[i:i + 52]) for i in range(len(data) - 52)]
+    return tenkan_data, kijun_data, senkou_A_data, senkou_B_data
+
+
+def test_stream_snapshot_matches_baseline_decision(walk):
+    prices = walk(DATA_LIMIT + 300)
+    stream = IchimokuStream()
+    for t, price in enumerate(prices):
+        stream.push(price)
+        if t + 1 >= DATA_LIMIT:
+            # the trader decides on components lagging the live price by one period
+            lines = stream.snapshot(lag=1)
+            window = prices[t + 1 - DATA_LIMIT:t + 1]
+            assert tuple(lines)[1:] == baseline_decision(window)[1:]
+            assert lines.price == window[-2]
+
+
+def test_stream_readiness():
+    stream = IchimokuStream()
+    for i in range(52 + DISPLACEMENT):
+        assert not stream.ready(lag=1)
+        stream.push(float(i))
+    assert stream.ready(lag=0)
+    assert not stream.ready(lag=1)
+    stream.push(0.0)
+    assert stream.ready(lag=1)
+    with pytest.raises(ValueError):
+        IchimokuStream().snapshot()
+
+
+def test_ring_buffer_matches_list_window(walk):
+    ring = RingBuffer(DATA_LIMIT)
+    window = list()
+    for price in walk(3 * DATA_LIMIT + 7):
+        ring.append(price)
+        window.append(price)
+        if len(window) > DATA_LIMIT:
+            del window[0]
+        assert len(ring) == len(window)
+        assert list(ring) == window
+        assert ring[-1] == window[-1] and ring[0] == window[0]
+        assert ring[9:35].tolist() == window[9:35]
+    with pytest.raises(IndexError):
+        ring[DATA_LIMIT]
+    assert not ring.view().flags.writeable
+
+
+def test_lines_match_baseline_slicing(walk):
+    prices = walk(500)
+    lines = ichimoku_lines(prices)
+    tenkan, kijun, senkou_A, senkou_B = baseline_plot(prices)
+    # every baseline entry is computed from the window ending one period before the next entry
+    assert lines.tenkan[8:-1].tolist() == tenkan
+    assert lines.kijun[25:-1].tolist() == kijun
+    assert lines.senkou_A[25:-1].tolist() == senkou_A
+    assert lines.senkou_B[51:-1].tolist() == senkou_B
+    assert np.isnan(lines.tenkan[:8]).all() and np.isnan(lines.senkou_B[:51]).all()
+
+
+def test_lines_of_many_tickers(walk):
+    prices = np.array([walk(200, f"SYN{i}") for i in range(4)])
+    lines = ichimoku_lines(prices)
+    for i in range(4):
+        single = ichimoku_lines(prices[i])
+        for batched, alone in zip(lines, single):
+            np.testing.assert_array_equal(batched[i], alone)
+
+
+def test_prepare_data_matches_baseline(walk):
+    pytest.importorskip("matplotlib")
+    from edartPlot.script import Ichimoku
+
+    # the constructor only picks a style, which needs not be installed
+    plot = Ichimoku.__new__(Ichimoku)
+    plot.ticker = "SYN0"
+    plot.data = walk(400)
+    plot.len_data = len(plot.data)
+    plot.prepare_data()
+    baseline = baseline_plot(plot.data)
+    produced = (plot.tenkan_data, plot.kijun_data, plot.senkou_A_data, plot.senkou_B_data)
+    for lines, expected in zip(produced, baseline):
+        assert list(lines) == expected
+
+
+def test_latest_mid_matches_rolling_mid(walk):
+    prices = np.array([walk(120, f"SYN{i}", seed=i) for i in range(4)])
+    for period in (9, 26, 52):
+        rolling = rolling_mid(prices, period)
+        for end in (-1, -1 - DISPLACEMENT, prices.shape[1]):
+            np.testing.assert_array_equal(latest_mid(prices, end, period), rolling[:, end - 1])
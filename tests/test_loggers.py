@@ -0,0 +1,46 @@
+import logging
+
+from library.loggers import queue_logger, writer
+
+
+def read(path):
+    writer.flush()
+    with open(path, "r", encoding="utf-8") as fp:
+        return fp.read()
+
+
+def test_arguments_are_formatted_when_logged(tmp_path):
+    path = str(tmp_path / "args.log")
+    logger = queue_logger(path, path)
+    state = {"trade": "LONG"}
+    logger.info("State : %s", state)
+    # the caller goes on changing its state while the writer catches up
+    state["trade"] = "SHORT"
+    assert "State : {'trade': 'LONG'}" in read(path)
+
+
+def test_tracebacks_are_written(tmp_path):
+    path = str(tmp_path / "exc.log")
+    logger = queue_logger(path, path)
+    try:
+        raise ValueError("broken feed")
+    except ValueError:
+        logger.exception("Fetch failed")
+    content = read(path)
+    assert "Fetch failed" in content
+    assert "Traceback (most recent call last)" in content and "ValueError: broken feed" in content
+
+
+def test_records_of_other_handlers_are_untouched(tmp_path):
+    path = str(tmp_path / "shared.log")
+    logger = queue_logger(path, path)
+    seen = list()
+
+    class Keep(logging.Handler):
+        def emit(self, record):
+            seen.append(record)
+
+    logger.addHandler(Keep())
+    logger.info("Price %s", 10)
+    assert seen[0].args == (10,) and seen[0].msg == "Price %s"
+    assert "Price 10" in read(path)
@@ -0,0 +1,38 @@
+import gc
+import logging
+import os
+
+from conftest import RecordingLogger
+from library.metrics import METRICS_FILE, persist_time
+from master import Master
+from trader import DATA_LIMIT
+
+
+def test_observed_lines_match_decision_lines(traders):
+    crew = traders([f"SYN{i}" for i in range(3)])
+    master = Master(0, logging.getLogger("master"), 0.5, 1000, None, False)
+    master.traders.extend(crew)
+    master.init_traders()
+    for trader in crew:
+        assert len(trader.price) == DATA_LIMIT
+        lines = trader.ichimoku.snapshot(lag=1)
+        expected = "Observed status - Tenkan : %s, Kijun : %s, Senkou A : %s, Senkou B : %s" % tuple(lines)[1:]
+        assert trader.logger.records[-1] == expected
+
+
+def test_shutdown_metrics_include_saved_databases(traders, session_dir):
+    crew = traders([f"SYN{i}" for i in range(3)])
+    master = Master(0, RecordingLogger("master"), 0.5, 1000, None, False)
+    master.traders.extend(crew)
+    master.init_traders()
+    saved, logged = persist_time.count("database"), persist_time.count("log")
+    master.run_round(1)
+    # fetching and deciding log at least once each per trader
+    assert persist_time.count("log") >= logged + 2 * len(crew)
+    del master
+    gc.collect()
+    assert all(trader.saved for trader in crew)
+    assert sorted(os.listdir(session_dir)).count("SYN0.json") == 1
+    with open(METRICS_FILE) as fp:
+        counts = [line for line in fp if line.startswith('edartpy_persist_seconds_count{stage="database"}')]
+    assert counts == [f'edartpy_persist_seconds_count{{stage="database"}} {saved + len(crew)}\n']
@@ -0,0 +1,42 @@
+import random
+
+import numpy as np
+
+from library.ichimoku import ichimoku_lines, DISPLACEMENT
+from library.model import BatchModel, Model
+
+
+def states(prices, seed=0):
+    """
+        Snapshots of the Ichimoku lines over a series of prices, with random previous states
+    """
+    rng = random.Random(seed)
+    lines = ichimoku_lines(prices)
+    rows = list()
+    for t in range(52 + DISPLACEMENT, len(prices)):
+        rows.append((prices[t], lines.tenkan[t], lines.kijun[t], lines.senkou_A[t - DISPLACEMENT],
+                     lines.senkou_B[t - DISPLACEMENT], prices[t - DISPLACEMENT], rng.choice((-1, 0, 1)),
+                     rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)), lines.senkou_A[t],
+                     lines.senkou_B[t]))
+    return rows
+
+
+def test_batch_model_matches_model(walk):
+    rows = states(walk(3000))
+    expected = [Model(*row).get_conf() for row in rows]
+    scored = BatchModel(*[np.array(column) for column in zip(*rows)]).get_conf()
+    assert scored.tolist() == expected
+
+
+def test_batch_model_components_match_model(walk):
+    rows = states(walk(600), seed=1)
+    batch = BatchModel(*[np.array(column) for column in zip(*rows)])
+    for name in ("tk_cross", "kijun_cross", "chikou_break", "kumo_twist"):
+        assert getattr(batch, name)().tolist() == [getattr(Model(*row), name)() for row in rows]
+
+
+def test_batch_model_on_equal_lines():
+    # ties between lines take the neutral branches of Model
+    row = (10.0, 10.0, 10.0, 10.0, 10.0, 10.0, 0, 0, 0, 0, 10.0, 10.0)
+    scored = BatchModel(*[np.array([value]) for value in row]).get_conf()
+    assert scored.tolist() == [Model(*row).get_conf()]
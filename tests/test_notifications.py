@@ -0,0 +1,34 @@
+import re
+import threading
+
+from library.notifications import Console
+
+
+def test_every_message_is_rendered_or_counted_as_dropped(capsys):
+    console = Console(instant=True, size=4, window=0)
+    threads, count = 8, 300
+
+    def produce(number):
+        for i in range(count):
+            console.write(f"message {number}-{i}")
+
+    producers = [threading.Thread(target=produce, args=(number,)) for number in range(threads)]
+    for producer in producers:
+        producer.start()
+    for producer in producers:
+        producer.join()
+    console.flush()
+    out = capsys.readouterr().out
+    rendered = len(re.findall(r"^message \d+-\d+$", out, re.MULTILINE))
+    reported = sum(int(dropped) for dropped in re.findall(r"dropped (\d+) messages", out))
+    assert rendered + reported + console.dropped == threads * count
+
+
+def test_repeats_are_coalesced(capsys):
+    console = Console(instant=True)
+    for _ in range(5):
+        console.notify("[ INFO ]  ", "same", 0)
+    console.notify("[ INFO ]  ", "other", 0)
+    console.flush()
+    assert capsys.readouterr().out.splitlines() == [
+        "[ INFO ]  same", "[ INFO ]  (last message repeated 4 more times)", "[ INFO ]  other"]
@@ -0,0 +1,44 @@
+import tracemalloc
+
+from library.profiling import Profiler
+
+
+def test_sampled_phase_traces_only_sampled_rounds(tmp_path):
+    profiler = Profiler(every=2, directory=str(tmp_path))
+    kept = list()
+    tracing = list()
+    with profiler.phase("trading", sample=True):
+        assert not tracemalloc.is_tracing()
+        for count in range(4):
+            with profiler.round(count):
+                tracing.append(tracemalloc.is_tracing())
+                kept.append(bytearray(1 << 16))
+    assert tracing == [True, False, True, False]
+    assert not tracemalloc.is_tracing()
+    with open(tmp_path / "profile-trading.txt") as fp:
+        assert fp.readline() == "Sampled 2 rounds, one out of every 2\n"
+    with open(tmp_path / "profile-trading.allocations.txt") as fp:
+        report = fp.read()
+    # the growth of both sampled rounds adds up on the line allocating the buffers
+    growth = report.split("\n\n")[1].splitlines()[1]
+    assert __file__ in growth and "size=128 KiB (+128 KiB)" in growth
+
+
+def test_whole_phase_is_traced(tmp_path):
+    profiler = Profiler(directory=str(tmp_path))
+    with profiler.phase("observation"):
+        assert tracemalloc.is_tracing()
+        with profiler.round(0):
+            pass
+    assert not tracemalloc.is_tracing()
+    with open(tmp_path / "profile-observation.allocations.txt") as fp:
+        assert fp.readline().endswith("held at the end of the phase\n")
+
+
+def test_phase_without_sampled_rounds(tmp_path):
+    profiler = Profiler(every=10, directory=str(tmp_path))
+    with profiler.phase("trading", sample=True):
+        with profiler.round(3):
+            pass
+    with open(tmp_path / "profile-trading.allocations.txt") as fp:
+        assert fp.read() == "No allocations traced\n"
@@ -0,0 +1,84 @@
+import pytest
+
+from library import scheduler
+from library.scheduler import COMPRESS, Scheduler
+
+
+class Clock:
+    """
+        Wall clock of the scheduler, advanced by its sleeps only
+    """
+
+    def __init__(self, now):
+        self.now = now
+        self.sleeps = list()
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def install(monkeypatch, now):
+    clock = Clock(now)
+    monkeypatch.setattr(scheduler, "time", clock.time)
+    monkeypatch.setattr(scheduler, "sleep", clock.sleep)
+    return clock
+
+
+def test_idle_called_while_waiting(monkeypatch):
+    clock = install(monkeypatch, 1000.5)
+    calls = list()
+    plan = Scheduler(5)
+    assert plan.wait(lambda: calls.append(clock.now)) == 1005
+    assert clock.now == 1005
+    # called before every sleep, none of which is longer than the idle step
+    assert len(calls) == len(clock.sleeps) == 5
+    assert max(clock.sleeps) <= scheduler.IDLE_STEP
+
+
+def test_sleeps_through_without_idle(monkeypatch):
+    clock = install(monkeypatch, 1000.5)
+    assert Scheduler(5).wait() == 1005
+    assert clock.sleeps == [4.5]
+
+
+def overrun(monkeypatch, lateness, **kwargs):
+    """
+        Deadline of the round after one which ran until lateness past the next deadline, in periods of 10 seconds
+    """
+    clock = install(monkeypatch, 1000)
+    plan = Scheduler(10, **kwargs)
+    plan.wait()
+    clock.now = 1010 + lateness * 10
+    return plan, plan.wait()
+
+
+def test_skip_fires_slightly_late_round(monkeypatch):
+    plan, deadline = overrun(monkeypatch, 0.05)
+    assert deadline == 1010 and plan.skipped == 0
+    assert plan.stats()["last"] == pytest.approx(0.5)
+
+
+def test_skip_drops_late_round(monkeypatch):
+    plan, deadline = overrun(monkeypatch, 0.5)
+    assert deadline == 1020 and plan.skipped == 1
+
+
+def test_skip_drops_only_passed_deadlines(monkeypatch):
+    plan, deadline = overrun(monkeypatch, 2.05)
+    assert deadline == 1030 and plan.skipped == 2
+    plan, deadline = overrun(monkeypatch, 2.5)
+    assert deadline == 1040 and plan.skipped == 3
+
+
+def test_skip_without_tolerance(monkeypatch):
+    plan, deadline = overrun(monkeypatch, 0.05, tolerance=0)
+    assert deadline == 1020 and plan.skipped == 1
+
+
+def test_compress_fires_backlog(monkeypatch):
+    plan, deadline = overrun(monkeypatch, 5.5, overrun=COMPRESS, backlog=3)
+    assert deadline == 1030 and plan.skipped == 2
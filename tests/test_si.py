@@ -0,0 +1,168 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import library.si as si
+from library import configure_history, set_source
+from library.sources import LiveSource
+from conftest import RecordingLogger
+from master import Master
+
+# time of the single bar of chart responses, in seconds since the epoch
+STAMP = 1594800000
+
+
+class StubYahoo:
+    """
+        Stub of the quote and chart endpoints, serving the prices it is given and recording every request
+    """
+
+    def __init__(self):
+        self.quotes = dict()
+        self.charts = dict()
+        self.quote_status = 200
+        self.requests = list()
+
+    def respond(self, handler):
+        url = urlparse(handler.path)
+        query = parse_qs(url.query)
+        self.requests.append((url.path, query))
+        if url.path == "/quote":
+            if self.quote_status != 200:
+                return self.quote_status, {"finance": {"error": "stub failure"}}
+            symbols = query["symbols"][0].split(",")
+            result = [{"symbol": symbol, "regularMarketPrice": self.quotes[symbol]}
+                      for symbol in symbols if symbol in self.quotes]
+            return 200, {"quoteResponse": {"result": result}}
+        ticker = url.path.rsplit("/", 1)[-1]
+        if ticker not in self.charts:
+            return 404, {"chart": {"error": "not found"}}
+        price = self.charts[ticker]
+        bar = {"open": [price], "high": [price], "low": [price], "close": [price], "volume": [0]}
+        return 200, {"chart": {"result": [{"meta": {"regularMarketPrice": price}, "timestamp": [STAMP],
+                                           "indicators": {"quote": [bar]}}]}}
+
+
+@pytest.fixture
+def yahoo(monkeypatch):
+    stub = StubYahoo()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, body = stub.respond(self)
+            body = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    root = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(si, "quote_url", root + "/quote")
+    monkeypatch.setattr(si, "base_url", root + "/chart/")
+    yield stub
+    server.shutdown()
+    server.server_close()
+
+
+def test_batch_prices(yahoo):
+    yahoo.quotes = {"AAPL": 170.5, "MSFT": 330.25}
+    assert si.get_live_prices(["AAPL", "MSFT"]) == {"AAPL": 170.5, "MSFT": 330.25}
+    # every ticker is asked for in one request
+    assert [path for path, _ in yahoo.requests] == ["/quote"]
+    assert yahoo.requests[0][1]["symbols"] == ["AAPL,MSFT"]
+
+
+def test_batch_leaves_out_missing_tickers(yahoo):
+    yahoo.quotes = {"AAPL": 170.5}
+    assert si.get_live_prices(["AAPL", "NOPE"]) == {"AAPL": 170.5}
+    assert si.get_live_prices([]) == dict()
+    assert len(yahoo.requests) == 1
+
+
+def test_batch_keeps_requested_case(yahoo):
+    yahoo.quotes = {"AAPL": 170.5, "BRK-B": 400.0}
+    assert si.get_live_prices(["aapl", "Brk-B"]) == {"aapl": 170.5, "Brk-B": 400.0}
+    assert yahoo.requests[0][1]["symbols"] == ["AAPL,BRK-B"]
+
+
+def test_batch_failure_raises(yahoo):
+    yahoo.quote_status = 500
+    with pytest.raises(AssertionError):
+        si.get_live_prices(["AAPL"])
+
+
+def test_single_price(yahoo):
+    yahoo.charts = {"AAPL": 171.0}
+    assert si.get_live_price("AAPL") == 171.0
+    with pytest.raises(AssertionError):
+        si.get_live_price("NOPE")
+
+
+def test_history_not_cached_by_default(yahoo, tmp_path):
+    configure_history(directory=str(tmp_path / "history"))
+    try:
+        yahoo.charts["AAPL"] = 101.5
+        assert si.get_data("AAPL")["close"].tolist() == [101.5]
+        assert not (tmp_path / "history").exists()
+        assert si.get_data("AAPL", cache=True)["close"].tolist() == [101.5]
+        assert [path.name for path in (tmp_path / "history").iterdir()] == ["AAPL.1d.pkl"]
+    finally:
+        configure_history()
+
+
+@pytest.fixture
+def master(traders, yahoo):
+    """
+        Build a master of live traders, held by the test alone so it saves itself before the directory goes
+    """
+    def make(period=0):
+        # failures are logged with their exception, which must not outlive the test in captured records
+        master = Master(period, RecordingLogger("master"), 0.5, 1000, None, False)
+        master.traders.extend(traders(["AAPL", "MSFT", "NOPE"]))
+        set_source(LiveSource())
+        return master
+
+    return make
+
+
+def test_round_prices_batched(master, yahoo):
+    yahoo.quotes = {"AAPL": 170.5, "MSFT": 330.25, "NOPE": 1.0}
+    assert master().fetch_prices() == {"AAPL": 170.5, "MSFT": 330.25, "NOPE": 1.0}
+    assert [path for path, _ in yahoo.requests] == ["/quote"]
+
+
+def test_round_falls_back_per_ticker(master, yahoo):
+    # a ticker left out of the batch is priced on its own, one which cannot be priced at all is left out
+    yahoo.quotes = {"AAPL": 170.5}
+    yahoo.charts = {"MSFT": 331.0}
+    assert master().fetch_prices() == {"AAPL": 170.5, "MSFT": 331.0}
+    assert sorted(path for path, _ in yahoo.requests) == ["/chart/MSFT", "/chart/NOPE", "/quote"]
+
+
+def test_round_falls_back_when_batch_fails(master, yahoo):
+    yahoo.quote_status = 500
+    yahoo.charts = {"AAPL": 171.0, "MSFT": 331.0, "NOPE": 2.0}
+    assert master().fetch_prices() == {"AAPL": 171.0, "MSFT": 331.0, "NOPE": 2.0}
+
+
+def test_warm_start_asks_for_bars_of_the_period(master, yahoo):
+    yahoo.charts = {"AAPL": 171.0, "MSFT": 331.0, "NOPE": 2.0}
+    assert master(300).warm_start() == 1
+    assert sorted(path for path, _ in yahoo.requests) == ["/chart/AAPL", "/chart/MSFT", "/chart/NOPE"]
+    assert {query["interval"][0] for _, query in yahoo.requests} == {"5m"}
+
+
+def test_warm_start_observes_live_without_matching_bars(master, yahoo):
+    boss = master(45)
+    assert boss.warm_start() == 0
+    assert yahoo.requests == []
+    assert "observing live instead" in boss.logger.records[-1]
@@ -0,0 +1,91 @@
+import json
+import os
+
+import pytest
+
+from library.sources import LiveSource, PriceSource, ReplaySource, SyntheticSource, make_source
+from library.ticks import TickWriter
+
+
+@pytest.fixture
+def captures(tmp_path):
+    """
+        Day directory holding a JSON capture, a tick file and an empty tick file
+    """
+    day = tmp_path / "01-02-2021"
+    day.mkdir()
+    with open(day / "AAA.json", "w") as fp:
+        fp.write(json.dumps({"ticker": "AAA", "data": {"09:00:00": 1.0, "09:01:00": 2.0}}))
+    with TickWriter(str(day / "BBB.ticks"), "BBB") as writer:
+        writer.write("09:00:00", 10.0)
+        writer.write("09:01:00", 11.0)
+        writer.write("09:02:00", 12.0)
+    TickWriter(str(day / "CCC.ticks"), "CCC").close()
+    return tmp_path
+
+
+def test_price_source_is_abstract():
+    with pytest.raises(TypeError):
+        PriceSource()
+
+
+def test_replay_cycles_through_captures(captures):
+    source = ReplaySource(str(captures))
+    assert sorted(source.candidates()) == ["AAA", "BBB", "CCC"]
+    assert [source.get_price("AAA") for _ in range(5)] == [1.0, 2.0, 1.0, 2.0, 1.0]
+    assert [source.get_price("BBB") for _ in range(4)] == [10.0, 11.0, 12.0, 10.0]
+
+
+def test_replay_follows_days_in_chronological_order(tmp_path):
+    # the January capture sorts after the February one by name
+    for day, price in (("15-01-2021", 1.0), ("01-02-2021", 2.0), ("03-02-2021", 3.0)):
+        (tmp_path / day).mkdir()
+        with open(tmp_path / day / "AAA.json", "w") as fp:
+            fp.write(json.dumps({"ticker": "AAA", "data": {"09:00:00": price}}))
+    source = ReplaySource(str(tmp_path))
+    assert [source.get_price("AAA") for _ in range(4)] == [1.0, 2.0, 3.0, 1.0]
+
+
+def test_replay_without_ticks_keeps_raising_lookup_error(captures):
+    source = ReplaySource(str(captures))
+    for _ in range(3):
+        with pytest.raises(LookupError):
+            source.get_price("CCC")
+    with pytest.raises(LookupError):
+        source.get_price("ZZZ")
+
+
+def test_replay_round_leaves_out_exhausted_tickers(captures):
+    source = ReplaySource(str(captures))
+    # rounds go on without the tickers which cannot be priced
+    for _ in range(3):
+        assert set(source.get_prices(["BBB", "CCC", "ZZZ"])) == {"BBB"}
+
+
+def test_synthetic_is_deterministic():
+    first, second = SyntheticSource(7), SyntheticSource(7)
+    assert [first.get_price("X") for _ in range(50)] == [second.get_price("X") for _ in range(50)]
+    assert [SyntheticSource(8).get_price(f"X{i}") for i in range(5)] != \
+        [SyntheticSource(7).get_price(f"X{i}") for i in range(5)]
+
+
+def test_recent_prices_of_sources_without_history(captures):
+    source = ReplaySource(str(captures))
+    assert source.get_recent_prices("BBB", 4, 60) == [10.0, 11.0, 12.0, 10.0]
+
+
+def test_make_source(captures):
+    assert isinstance(make_source("synthetic:3"), SyntheticSource)
+    assert isinstance(make_source(f"replay:{os.path.join(captures, '01-02-2021')}"), ReplaySource)
+    with pytest.raises(ValueError):
+        make_source("bogus")
+
+
+def test_live_warm_start_needs_bars_of_the_period():
+    source = LiveSource()
+    assert source.can_warm(60) and source.can_warm(5400)
+    assert not source.can_warm(45)
+    with pytest.raises(LookupError):
+        source.get_recent_prices("AAPL", 80, 45)
+    # sources without history poll their prices whatever the period
+    assert SyntheticSource(0).can_warm(45)
@@ -0,0 +1,30 @@
+from library import ticks
+from library.ticks import TickReader, TickWriter
+
+
+def test_polled_writer_flushes_old_ticks(tmp_path, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(ticks, "monotonic", lambda: clock[0])
+    path = str(tmp_path / "SYN0.ticks")
+    with TickWriter(path, "SYN0", size=10, interval=5.0) as writer:
+        reader = TickReader(path)
+        writer.write("09:15:00", 100.0)
+        clock[0] += 4.9
+        writer.poll()
+        assert reader.poll() == []
+        # no tick arrives, the buffer still reaches the disk once it is old enough
+        clock[0] += 0.1
+        writer.poll()
+        assert reader.poll() == [("09:15:00", 100.0)]
+        writer.poll()
+        assert reader.poll() == []
+
+
+def test_writer_flushes_full_buffer(tmp_path):
+    path = str(tmp_path / "SYN0.ticks")
+    with TickWriter(path, "SYN0", size=2, interval=60.0) as writer:
+        reader = TickReader(path)
+        writer.write("09:15:00", 100.0)
+        assert reader.poll() == []
+        writer.write("09:16:00", 101.0)
+        assert reader.poll() == [("09:15:00", 100.0), ("09:16:00", 101.0)]
@@ -0,0 +1,44 @@
+import datetime
+
+import numpy as np
+
+from library.tickstore import TZ, TickStore, capture_times, import_captures
+from library.ticks import TickWriter
+
+
+def test_capture_times_follow_the_miner_time_zone():
+    # London is on GMT in winter and on BST in summer
+    winter = capture_times("15-01-2020", ["09:15:00", "15:15:00"])
+    summer = capture_times("15-07-2020", ["09:15:00"])
+    assert winter.tolist() == [int(datetime.datetime(2020, 1, 15, 9, 15, tzinfo=datetime.timezone.utc).timestamp()),
+                               int(datetime.datetime(2020, 1, 15, 15, 15, tzinfo=datetime.timezone.utc).timestamp())]
+    assert summer.tolist() == [int(datetime.datetime(2020, 7, 15, 8, 15, tzinfo=datetime.timezone.utc).timestamp())]
+
+
+def test_reading_does_not_create_the_store(tmp_path):
+    root = tmp_path / "ticks"
+    store = TickStore(str(root))
+    assert store.tickers() == []
+    times, prices = store.load("SYN0")
+    assert len(times) == len(prices) == 0
+    assert store.last_time("SYN0") is None
+    assert not root.exists()
+
+
+def test_import_round_trip(tmp_path):
+    day = tmp_path / "captures" / "15-07-2020"
+    day.mkdir(parents=True)
+    with TickWriter(str(day / "SYN0.ticks"), "SYN0") as writer:
+        writer.write("09:15:00", 100.0)
+        writer.write("09:16:00", 101.5)
+    store = TickStore(str(tmp_path / "ticks"))
+    assert import_captures(store, [str(tmp_path / "captures")]) == {"SYN0": 2}
+    assert store.tickers() == ["SYN0"]
+    # a repeated import only adds new ticks
+    assert import_captures(store, [str(tmp_path / "captures")]) == {"SYN0": 0}
+    opening = TZ.localize(datetime.datetime(2020, 7, 15, 9, 15))
+    times, prices = store.load("SYN0", start=opening + datetime.timedelta(seconds=1))
+    assert times.tolist() == [datetime.datetime(2020, 7, 15, 8, 16)]
+    assert prices.tolist() == [101.5]
+    times, _ = store.load("SYN0", start=np.datetime64("2020-07-15T08:15"))
+    assert len(times) == 2
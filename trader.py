@@ -1,8 +1,11 @@
 import datetime
 import json
+import logging
 import pytz
-from OpenSSL.SSL import SysCallError
-from library import Notify, get_live_price, trader_logger
+from time import perf_counter
+from library import IchimokuStream, Notify, RingBuffer, get_source, trader_logger
+from library.metrics import decision_time, orders, persist_time, retries
+from library.session import ssl_errors
 
 # number of observations of prices during initialisation phase, minimum value of 80
 DATA_LIMIT = 80
@@ -10,27 +13,26 @@ TZ = pytz.timezone('Europe/London')
 BUFFER_PERCENT = 0.06
 
 class Trader:
-    def __init__(self, number, ticker, account):
+    __slots__ = ("account", "number", "ticker", "rounds", "price", "ichimoku", "database", "IN_SHORT_TRADE",
+                 "IN_LONG_TRADE", "STOCKS_TO_SELL", "STOCKS_TO_BUY_BACK", "price_for_buffer", "sold_price",
+                 "bought_price", "logger", "saved")
+
+    def __init__(self, number, ticker, account, prev_data=None, logger=None):
         self.account = account
         self.number = number
         self.ticker = ticker
-        # store x values, equivalent to time
-        self.time = [i for i in range(-25, DATA_LIMIT + 27)]
-        # list for storing live price
-        self.price = []
-        # lists for storing Ichimoku params
-        self.tenkan_data = []
-        self.kijun_data = []
-        self.chikou_data = []
-        self.senkou_A_data = []
-        self.senkou_B_data = []
-        # x values for senkou A and senkou B
-        self.x5 = []
-        self.x6 = []
+        # number of rounds traded, x values are computed from it
+        self.rounds = 0
+        # window of live prices, the oldest price is evicted as a new one arrives
+        self.price = RingBuffer(DATA_LIMIT)
+        # streaming engine for Ichimoku params, updated as each price arrives
+        self.ichimoku = IchimokuStream()
         # database to save activity of trader
         self.database = dict()
         self.database["Ticker"] = self.ticker
         self.database["Activity"] = dict()
+        # whether the database on disk holds every recorded trade
+        self.saved = False
         # other params used within trader class
         self.IN_SHORT_TRADE = False
         self.IN_LONG_TRADE = False
@@ -40,7 +42,8 @@ class Trader:
         self.sold_price = 0
         self.bought_price = 0
         # set params in accordance with previous day's data
-        prev_data = json.loads(open("../user_info.json").read())
+        if prev_data is None:
+            prev_data = json.loads(open("../user_info.json").read())
         # check if allotted stock has been bought the previous day or not, long trade
         if self.ticker in prev_data["stocks_to_sell"]:
             price = prev_data["stocks_to_sell"][self.ticker]["buffer_price"]
@@ -51,121 +54,126 @@ class Trader:
             price = prev_data["stocks_to_buy_back"][self.ticker]["buffer_price"]
             self.IN_SHORT_TRADE = True
             self.price_for_buffer = price
-        self.logger = trader_logger(self.ticker)
+        self.logger = trader_logger(self.ticker) if logger is None else logger
         self.logger.info("-" * 76)
         self.logger.info("-" * 27 + " NEW SESSION DETECTED " + "-" * 27)
         self.logger.info("-" * 76)
 
-    def get_initial_data(self):
+    def get_initial_data(self, price=None):
         try:
-            self.price.append(get_live_price(self.ticker))
+            # fetch own price unless it has been fetched along with the other traders
+            if price is None:
+                price = get_source().get_price(self.ticker)
+            self.price.append(price)
+            self.ichimoku.push(price)
             self.logger.debug("Successfully fetched live price")
-        except SysCallError:
+        except ssl_errors():
             Notify.warn(
                 f"[Trader #{self.number} {self.ticker}]: Encountered SysCallError while initialising parameters, trying recursion")
             self.logger.warning("Encountered SysCallError, trying recursion")
+            retries.inc(label="observe")
             self.get_initial_data()
         except Exception as e:
             Notify.warn(
                 f"[Trader #{self.number} {self.ticker}]: Exception in getting initial data, trying recursion")
             self.logger.error(
-                "Trying recursion due to uncommon Exception : ", e)
+                "Trying recursion due to uncommon Exception : %s", e)
+            retries.inc(label="observe")
             self.get_initial_data()
 
+    # x values of the price window, equivalent to time
+    @property
+    def time(self):
+        return range(self.rounds - 25, self.rounds + DATA_LIMIT + 27)
+
+    # time of day used to record activity
+    def timestamp(self):
+        return datetime.datetime.now(TZ).strftime('%H:%M:%S')
+
     def buy(self, price, trade):
         # global ACCOUNT
-        now = datetime.datetime.now(TZ).strftime('%H:%M:%S')
         self.bought_price = price
-        self.logger.info("Bought stock, in ", trade, " trade, for $", price)
 
         #TODO - is account set property or just local to trader?
         self.account -= price
-        self.database['Activity'][now] = {
-            "trade": trade,
-            "bought at": price
-        }
+        self.record("BUY", trade, price)
 
     def sell(self, price, trade):
         # global ACCOUNT
-        now = datetime.datetime.now(TZ).strftime('%H:%M:%S')
         self.sold_price = price
-        self.logger.info("Sold stock, in ", trade, " trade, for $", price)
         self.account += price
-        self.database['Activity'][now] = {
-            "trade": trade,
-            "sold at": price
-        }
-
-    def update_price(self):
+        self.record("SELL", trade, price)
+
+    # log a trade and save it in the activity of the trader
+    def record(self, action, trade, price):
+        start = perf_counter()
+        orders.inc(label=action)
+        now = self.timestamp()
+        self.saved = False
+        if action == "BUY":
+            self.logger.info("Bought stock, in %s trade, for $%s", trade, price)
+            self.database['Activity'][now] = {
+                "trade": trade,
+                "bought at": price
+            }
+        else:
+            self.logger.info("Sold stock, in %s trade, for $%s", trade, price)
+            self.database['Activity'][now] = {
+                "trade": trade,
+                "sold at": price
+            }
+        persist_time.observe(perf_counter() - start, "record")
+
+    def update_price(self, new_price=None):
         try:
-            new_price = get_live_price(self.ticker)
+            # fetch own price unless it has been fetched along with the other traders
+            if new_price is None:
+                new_price = get_source().get_price(self.ticker)
             self.price.append(new_price)
-            self.logger.info(
-                "Successfully fetched price, local database updated")
-        except SysCallError:
+            self.ichimoku.push(new_price)
+            self.log(logging.INFO, "Successfully fetched price, local database updated")
+        except ssl_errors():
             Notify.warn(
                 f"[Trader #{self.number} {self.ticker}] : Encountered SysCallError in updating price, trying recursion")
             self.logger.warning(
                 "Encountered SysCallError while fetching live price, trying recursion")
+            retries.inc(label="trade")
             self.update_price()
         except Exception as e:
             Notify.warn(
                 f"[Trader #{self.number} {self.ticker}] : Exception in updating price, trying recursion")
             self.logger.error(
-                "Trying recursion, encountered uncommon exception : ", e)
+                "Trying recursion, encountered uncommon exception : %s", e)
+            retries.inc(label="trade")
             self.update_price()
 
-    def update_data(self):
-        self.update_price()
-        self.time.append(self.time[-1] + 1)
-        del self.time[0], self.price[0]
+    def update_data(self, price=None):
+        self.update_price(price)
+        self.rounds += 1
 
     # observe indicator and decide buy and sell
     def make_decision(self):
         # global ACCOUNT
-        # update tenkan data
-        self.tenkan_data = []
-        for i in range(DATA_LIMIT - 9):
-            tenkan_src = self.price[i:i + 9]
-            self.tenkan_data.append((max(tenkan_src) + min(tenkan_src)) / 2)
-        # update kijun data
-        self.kijun_data = []
-        for i in range(DATA_LIMIT - 26):
-            kijun_src = self.price[i:i + 26]
-            self.kijun_data.append((max(kijun_src) + min(kijun_src)) / 2)
-        # update x values for senkou A and senkou B
-        self.x5 = self.time[78:78 + DATA_LIMIT - 26]
-        self.x6 = self.time[104:104 + DATA_LIMIT - 52]
-        # update senkou A data
-        self.senkou_A_data = [
-            (self.tenkan_data[i + 17] + self.kijun_data[i]) / 2 for i in range(DATA_LIMIT - 26)]
-        # update senkou B data
-        self.senkou_B_data = []
-        for i in range(DATA_LIMIT - 52):
-            senkou_B_src = self.price[i:i + 52]
-            self.senkou_B_data.append(
-                (max(senkou_B_src) + min(senkou_B_src)) / 2)
-
-        # get Ichimoku params for comparison
-        x = self.time[26:26 + DATA_LIMIT][-1]
+        # get Ichimoku params for comparison, components lag the live price by one period
+        lines = self.ichimoku.snapshot(lag=1)
         curr_price = self.price[-1]
-        tenkan = self.tenkan_data[-1]
-        kijun = self.kijun_data[-1]
-        sen_A = self.get_value(self.senkou_A_data, self.x5, x)
-        sen_B = self.get_value(self.senkou_B_data, self.x6, x)
-        self.logger.info(
-            f"Current status - Price : {curr_price}, Tenkan : {tenkan}, Kijun : {kijun}, Senkou A : {sen_A}, Senkou B : {sen_B}")
+        tenkan = lines.tenkan
+        kijun = lines.kijun
+        sen_A = lines.senkou_A
+        sen_B = lines.senkou_B
+        self.log(logging.INFO, "Current status - Price : %s, Tenkan : %s, Kijun : %s, Senkou A : %s, Senkou B : %s",
+                 curr_price, tenkan, kijun, sen_A, sen_B)
 
         # conditions for long trade entry
         # If Kumo cloud is green and current price is above kumo, strong bullish signal
         cond1 = (sen_A > sen_B) and (curr_price >= sen_A)
         if cond1:
-            self.logger.debug("Sensing strong bullish signal")
+            self.log(logging.DEBUG, "Sensing strong bullish signal")
         # conditions for short trade entry
         # If Kumo cloud is red and current price is below kumo, strong bearish signal
         cond2 = (sen_A < sen_B) and (curr_price <= sen_A)
         if cond2:
-            self.logger.debug("Sensing strong bearish signal")
+            self.log(logging.DEBUG, "Sensing strong bearish signal")
         # check allocated money
         cond3 = curr_price < self.account
 
@@ -176,9 +184,7 @@ class Trader:
             self.IN_LONG_TRADE = True
             self.STOCKS_TO_SELL += 1
         if not cond3:
-            Notify.fatal(
-                f"[Trader #{self.number} {self.ticker}] : Oops! Out of cash!")
-            self.logger.critical("Trader out of cash to buy stocks!")
+            self.out_of_cash("Trader out of cash to buy stocks!")
         # If all conditions are right, short trade entry
         if cond2 and not self.IN_SHORT_TRADE:
             self.sell(curr_price, "SHORT")
@@ -202,29 +208,36 @@ class Trader:
                 self.IN_SHORT_TRADE = False
                 self.STOCKS_TO_BUY_BACK -= 1
             if not cond3:
-                Notify.fatal(
-                    f"[Trader #{self.number} {self.ticker}] : Oops! Out of cash!")
-                self.logger.critical("Trader out of cash to buy back stock !")
+                self.out_of_cash("Trader out of cash to buy back stock !")
+
+    # log from the trading path, the time spent logging is observed apart from saving
+    def log(self, level, message, *args):
+        if not self.logger.isEnabledFor(level):
+            return
+        start = perf_counter()
+        self.logger.log(level, message, *args)
+        persist_time.observe(perf_counter() - start, "log")
+
+    def out_of_cash(self, message):
+        Notify.fatal(f"[Trader #{self.number} {self.ticker}] : Oops! Out of cash!")
+        self.logger.critical(message)
 
     # group update and decision call for convenience
-    def run(self):
-        self.update_data()
+    def run(self, price=None):
+        self.update_data(price)
+        start = perf_counter()
         self.make_decision()
+        decision_time.observe(perf_counter() - start, "trader")
 
-    def __del__(self):
+    # save the activity of the trader in its database file
+    def save(self):
+        start = perf_counter()
         with open(self.ticker + ".json", "w") as fp:
             fp.write(json.dumps(self.database, indent=4))
-        self.logger.critical("Trader killed")
-
-    def get_value(self, ref: list, x_src: list, x: float) -> float:
-        """
-            Helper function for traders, used to find Ichimoku components corresponding to entry from other components or price
-        Args:
-            ref: iterable from which corresponding entry should be found
-            x_src: iterable containing param x
-            x: an item, maybe a component value, maybe price
+        self.saved = True
+        persist_time.observe(perf_counter() - start, "database")
 
-        Returns:
-
-        """
-        return ref[x_src.index(x)]
+    def __del__(self):
+        if not self.saved:
+            self.save()
+        self.logger.critical("Trader killed")